@@ -0,0 +1,78 @@
+# AUTHOR - MATTHEW RAYNER | ANIMATION SCHEDULER
+
+
+# LIBRARIES
+import math
+
+
+# FUNCTIONS
+def ease_out_cubic(t):
+    return 1 - (1 - t) ** 3
+
+
+def ease_out_back(t):
+    """ Overshoots a little before settling, used for cards landing """
+    return 1 + 2.7 * (t - 1) ** 3 + 1.7 * (t - 1) ** 2
+
+
+def lerp(start, end, amount):
+    if isinstance(start, tuple):
+        return tuple(a + (b - a) * amount for a, b in zip(start, end))
+    return start + (end - start) * amount
+
+
+def approach(current, target, rate, dt):
+    """ Eases current towards target, covering the same share of the gap per second at any frame rate """
+    return target + (current - target) * math.exp(-rate * dt)
+
+
+# CLASSES
+class Tween:
+    __slots__ = ('target', 'attr', 'start', 'end', 'duration', 'ease', 'delay', 'elapsed')
+
+    def __init__(self, target, attr, start, end, duration, ease, delay):
+        self.target = target
+        self.attr = attr
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.ease = ease
+        self.delay = delay
+        self.elapsed = 0.0
+
+    def advance(self, dt):
+        """ Moves the tween on by dt seconds and writes the value to its target, returns True once it is done """
+        self.elapsed += dt
+        progress = (self.elapsed - self.delay) / self.duration if self.duration else 1.0
+        if progress <= 0:
+            return False
+        progress = min(progress, 1.0)
+        setattr(self.target, self.attr, lerp(self.start, self.end, self.ease(progress)))
+        return progress >= 1.0
+
+
+class Animator:
+    """ Runs tweens of object attributes off elapsed time rather than frames, so nothing ever blocks the loop.
+        A new tween of an attribute replaces the one already running on it """
+    def __init__(self):
+        self.tweens = {}
+
+    @property
+    def active(self):
+        return bool(self.tweens)
+
+    def tween(self, target, attr, start, end, duration, ease=ease_out_cubic, delay=0.0):
+        """ Animates target.attr from start to end over duration seconds after delay, it is set to start straight away """
+        setattr(target, attr, start)
+        self.tweens[(id(target), attr)] = Tween(target, attr, start, end, duration, ease, delay)
+
+    def finish(self, target, attr):
+        """ Jumps a running tween to its end value """
+        tween = self.tweens.pop((id(target), attr), None)
+        if tween:
+            setattr(target, attr, tween.end)
+
+    def update(self, dt):
+        finished = [key for key, tween in self.tweens.items() if tween.advance(dt)]
+        for key in finished:
+            del self.tweens[key]
@@ -0,0 +1,90 @@
+# AUTHOR - MATTHEW RAYNER | BATCHED HAND EVALUATOR
+
+
+# LIBRARIES
+import numpy as np
+from engine import CARDS_PER_ROW, ROWS
+from hand_eval import (CATEGORY_SHIFT, WHEEL_MASK, HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH,
+                       FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH, ROYAL_FLUSH)
+
+
+# CONSTANTS
+EMPTY = -1 # Pads rows holding fewer than CARDS_PER_ROW cards
+PLAYER = 1
+OPPONENT = -1
+DRAW = 0
+_RANK_BITS = 1 << np.arange(13, dtype=np.int64)
+_NIBBLE_SHIFTS = np.arange(4 * (CARDS_PER_ROW - 1), -1, -4, dtype=np.int64)
+
+
+# FUNCTIONS
+def pad_rows(rows, width=CARDS_PER_ROW):
+    """ Converts lists of card codes of any length into an (N, width) array padded with EMPTY """
+    array = np.full((len(rows), width), EMPTY, dtype=np.int16)
+    for i, row in enumerate(rows):
+        array[i, :len(row)] = row
+    return array
+
+
+def evaluate_batch(codes):
+    """ Scores an (N, k) array of card codes (k <= CARDS_PER_ROW, EMPTY for missing cards).
+        Returns (strengths, categories), matching hand_eval.evaluate row for row """
+    codes = np.asarray(codes, dtype=np.int16)
+    if codes.ndim == 1:
+        codes = codes[np.newaxis]
+    n, k = codes.shape
+    if k > CARDS_PER_ROW:
+        raise ValueError(f'rows hold at most {CARDS_PER_ROW} cards, got {k}')
+
+    present = codes >= 0
+    ranks = np.where(present, codes % 13, -1)
+    suits = codes // 13
+    cards = present.sum(axis=1)
+
+    # Rank multiplicities and the distinct rank bitmask
+    counts = (ranks[:, :, np.newaxis] == np.arange(13)).sum(axis=1, dtype=np.int8)
+    distinct = counts > 0
+    rank_mask = (distinct * _RANK_BITS).sum(axis=1)
+    max_count = counts.max(axis=1)
+    pairs = (counts == 2).sum(axis=1)
+
+    # Flushes and straights only exist in full rows
+    full = cards == CARDS_PER_ROW
+    flush = full & np.all(suits == suits[:, :1], axis=1)
+    low = distinct.argmax(axis=1)
+    wheel = full & (rank_mask == WHEEL_MASK)
+    straight = full & ((rank_mask == (0b11111 << low)) | wheel)
+    straight_high = np.where(wheel, 5, low + 6)
+
+    categories = np.select(
+        [flush & straight & (straight_high == 14), flush & straight, max_count == 4, (max_count == 3) & (pairs == 1),
+         flush, straight, max_count == 3, pairs == 2, pairs == 1, cards > 0],
+        [ROYAL_FLUSH, STRAIGHT_FLUSH, FOUR_OF_A_KIND, FULL_HOUSE, FLUSH, STRAIGHT, THREE_OF_A_KIND, TWO_PAIR, PAIR, HIGH_CARD],
+        default=0
+    ).astype(np.int8)
+
+    # Tie-break ranks grouped by count and then rank, or counted down from the top card for straights
+    card_counts = np.take_along_axis(counts, np.maximum(ranks, 0), axis=1)
+    keys = np.where(present, card_counts * 16 + ranks + 2, 0)
+    keys = -np.sort(-keys, axis=1)
+    tiebreak = np.zeros((n, CARDS_PER_ROW), dtype=np.int64)
+    tiebreak[:, :k] = keys % 16
+    straight_cards = straight_high[:, np.newaxis] - np.arange(CARDS_PER_ROW)
+    tiebreak = np.where(straight[:, np.newaxis], straight_cards, tiebreak)
+
+    strengths = (categories.astype(np.int64) << CATEGORY_SHIFT) | (tiebreak << _NIBBLE_SHIFTS).sum(axis=1)
+    return strengths, categories
+
+
+def compare_boards(player_boards, opponent_boards):
+    """ Compares (N, ROWS, CARDS_PER_ROW) boards for each side like engine.compare_rows.
+        Returns (row_winners, winners) as (N, ROWS) and (N,) arrays of PLAYER, OPPONENT or DRAW """
+    player_boards = np.asarray(player_boards, dtype=np.int16)
+    opponent_boards = np.asarray(opponent_boards, dtype=np.int16)
+    n = player_boards.shape[0]
+
+    player_strengths, _ = evaluate_batch(player_boards.reshape(n * ROWS, -1))
+    opponent_strengths, _ = evaluate_batch(opponent_boards.reshape(n * ROWS, -1))
+    row_winners = np.sign(player_strengths - opponent_strengths).astype(np.int8).reshape(n, ROWS)
+    winners = np.sign(row_winners.sum(axis=1, dtype=np.int16)).astype(np.int8)
+    return row_winners, winners
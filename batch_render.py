@@ -0,0 +1,168 @@
+# AUTHOR - MATTHEW RAYNER | OFFSCREEN BATCH RENDERER
+
+
+# LIBRARIES
+import argparse
+import os
+import time
+from multiprocessing import Pool
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # No window is ever opened, set before pygame is imported
+os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1') # Otherwise SDL turns SIGTERM into a quit event and the pool cannot stop its workers
+import pygame
+import main as view
+from engine import DISCARD
+from hand_table import load_table
+from records import decode, iter_record_blocks, replay
+
+
+# Games from a records.py archive are drawn with main's draw_frame, so the boards, side menu and winner message
+# look exactly as they did in the window. Output goes to one directory named after each record's position in the archive:
+#   thumbnails  000123.png          the final board of every game
+#   frames      000123/00.png ...   the deal, then the board after every move
+# Every worker process sets up the scene once, loading the card faces, background and hand table, then renders
+# into the same offscreen surface for every game and saves it as it is, or scaled into a second reused surface
+
+# CONSTANTS
+RENDER_SIZE = (1728, 972) # A 1920x1080 display at main.WINDOW_SCALING, the size games are drawn at
+THUMBNAIL_WIDTH = 480 # Thumbnails are scaled to this width, keeping the aspect ratio
+RECORDS_PER_BLOCK = 50 # Records handed to a worker at a time, small since each takes a while to render
+_SCENES = []
+
+
+# CLASSES
+class OffscreenScene:
+    """ The surfaces and objects main() draws with, set up against a hidden 1x1 display. The display only has
+        to exist for convert_alpha, the frame itself is drawn into an ordinary surface """
+    def __init__(self, size=RENDER_SIZE, output_width=None, table_path=view.HAND_TABLE_FILE):
+        pygame.display.init()
+        pygame.font.init()
+        pygame.display.set_mode((1, 1))
+        self.width, self.height = size
+        self.surface = pygame.Surface(size)
+        self.output = self.surface
+        if output_width and output_width != self.width:
+            self.output = pygame.Surface((output_width, round(self.height * output_width / self.width)))
+
+        card_back = pygame.image.load(os.path.join('assets', 'card_back.png')).convert_alpha()
+        self.game_state = view.GameState(view.load_assets(), card_back, hand_table=load_table(table_path) if table_path else None)
+        self.layout = view.board_layout(self.width, self.height)
+        self.background = view.build_background(self.width, self.height, view.load_background(self.width, self.height), self.layout)
+        self.buttons = view.make_buttons(self.height)
+        self.drawn_position = (self.layout.draw_area_x, self.layout.draw_area_y['player'] - 5)
+
+    def render(self):
+        """ Draws the game as it stands, with the row flames fully grown since nothing is animated """
+        game_state = self.game_state
+        if game_state.player_hand:
+            game_state.sync_row_flames()
+            for flames in game_state.row_flames:
+                if flames:
+                    flames.width = flames.max_width
+        view.draw_frame(self.surface, self.background, game_state, self.layout, self.buttons, self.drawn_position, None, None, game_state.result(), self.width, self.height)
+
+    def save(self, path):
+        """ Writes the last render as a PNG, encoded straight from the surface's pixels """
+        if self.output is not self.surface:
+            pygame.transform.smoothscale(self.surface, self.output.get_size(), self.output)
+        pygame.image.save(self.output, path)
+
+
+# FUNCTIONS
+def init_worker(size, output_width, table_path):
+    _SCENES[:] = [OffscreenScene(size, output_width, table_path)]
+
+
+def render_thumbnail(scene, record, out_dir, index):
+    """ Saves the final board of a record, returns the number of images written """
+    if replay(record, scene.game_state) is None:
+        return 0
+    scene.render()
+    scene.save(os.path.join(out_dir, f'{index:06d}.png'))
+    return 1
+
+
+def render_frames(scene, record, out_dir, index):
+    """ Saves the deal and the board after each move of a record, returns the number of images written """
+    game_state = scene.game_state
+    if replay(record, game_state) is None:
+        return 0
+    game_dir = os.path.join(out_dir, f'{index:06d}')
+    os.makedirs(game_dir, exist_ok=True)
+    game_state.deck.cards[:] = reversed(record.deal_order)
+    game_state.deal_hands()
+    scene.render()
+    scene.save(os.path.join(game_dir, '00.png'))
+    for frame, move in enumerate(record.moves, 1):
+        game_state.draw_card()
+        if move != DISCARD:
+            game_state.place_card(move)
+        scene.render()
+        scene.save(os.path.join(game_dir, f'{frame:02d}.png'))
+    return len(record.moves) + 1
+
+
+def render_block(task):
+    """ Renders a block of records in a worker, returns (games, images, illegal) """
+    first_index, block, out_dir, frames = task
+    scene = _SCENES[0]
+    games = images = illegal = 0
+    offset = 0
+    index = first_index
+    while offset < len(block):
+        record, offset = decode(block, offset)
+        written = (render_frames if frames else render_thumbnail)(scene, record, out_dir, index)
+        games += 1
+        images += written
+        illegal += not written
+        index += 1
+    return games, images, illegal
+
+
+def render_archive(path, out_dir, frames=False, output_width=None, workers=None, size=RENDER_SIZE, table_path=view.HAND_TABLE_FILE):
+    """ Renders every record in an archive across a process pool, returns (games, images, illegal).
+        output_width defaults to THUMBNAIL_WIDTH for thumbnails and the render size for frames """
+    if output_width is None and not frames:
+        output_width = THUMBNAIL_WIDTH
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    tasks = ((number * RECORDS_PER_BLOCK, block, out_dir, frames) for number, block in enumerate(iter_record_blocks(path, RECORDS_PER_BLOCK)))
+
+    if workers == 1:
+        init_worker(size, output_width, table_path)
+        return sum_totals(map(render_block, tasks))
+    with Pool(workers, initializer=init_worker, initargs=(size, output_width, table_path)) as pool:
+        return sum_totals(pool.imap_unordered(render_block, tasks))
+
+
+def sum_totals(results):
+    totals = (0, 0, 0)
+    for block_totals in results:
+        totals = tuple(total + value for total, value in zip(totals, block_totals))
+    return totals
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Renders recorded games to PNG thumbnails or frame sequences without a window')
+    parser.add_argument('archive', help='a records.py archive')
+    parser.add_argument('output', help='directory the images are written to')
+    parser.add_argument('--frames', action='store_true', help='a frame per move instead of a thumbnail of the final board')
+    parser.add_argument('--width', type=int, default=None, help=f'width of the saved images, defaults to {THUMBNAIL_WIDTH} for thumbnails and the render width for frames')
+    parser.add_argument('--size', type=parse_size, default=RENDER_SIZE, metavar='WxH', help='size the board is drawn at')
+    parser.add_argument('--table', default=view.HAND_TABLE_FILE, help='hand table for the side menu odds, skipped if it has not been built')
+    parser.add_argument('--workers', type=int, default=None, help='defaults to one per CPU')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games, images, illegal = render_archive(args.archive, args.output, args.frames, args.width, args.workers, args.size, args.table)
+    elapsed = time.perf_counter() - start
+    print(f'{games} games rendered to {images} images in {args.output} in {elapsed:.2f}s ({images / max(elapsed, 1e-9):.1f} images/s), {illegal} illegal records skipped')
+
+
+if __name__ == "__main__":
+    main()
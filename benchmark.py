@@ -0,0 +1,207 @@
+# AUTHOR - MATTHEW RAYNER | BENCHMARK SUITE
+
+
+# LIBRARIES
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # Frames are rendered offscreen, set before pygame is imported
+import pygame
+import main as view
+from engine import DECK_SIZE, ROWS, card_value, compare_rows, play_game, rank_hand, validate_row
+from hand_eval import hand_category
+from policies import random_policy
+
+
+# CONSTANTS
+SCREEN_SIZE = (1728, 972) # A 1920x1080 display at main.WINDOW_SCALING
+MIN_TIME = 0.2 # Seconds each measurement runs for
+REPEATS = 5 # Measurements per benchmark, the fastest is kept
+SAMPLES = 1000 # Inputs generated for each microbenchmark
+BOARD_FILLS = {'empty': 0, 'half': 20, 'full': 40} # Cards placed after the deal, 'empty' is just the dealt rows
+
+
+# FUNCTIONS
+def measure(run, calls_per_run, min_time=MIN_TIME, repeats=REPEATS):
+    """ Returns the fastest seconds per call of run(), which makes calls_per_run calls each time it is run """
+    best = float('inf')
+    for _ in range(repeats):
+        runs = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time / repeats or not runs:
+            run()
+            runs += 1
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed / (runs * calls_per_run))
+    return best
+
+
+def result(value, unit, higher_is_better=False):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def random_rows(rng, count, size):
+    return [rng.sample(range(DECK_SIZE), size) for _ in range(count)]
+
+
+def random_boards(rng, count):
+    """ Full (player, opponent) boards dealt from one deck each """
+    boards = []
+    for _ in range(count):
+        deck = rng.sample(range(DECK_SIZE), 2 * ROWS * 5)
+        boards.append(([deck[i:i + 5] for i in range(0, 25, 5)], [deck[i:i + 5] for i in range(25, 50, 5)]))
+    return boards
+
+
+def bench_rank_hand(rng):
+    rows = random_rows(rng, SAMPLES, 5)
+    def run():
+        for row in rows:
+            rank_hand(row)
+    return result(measure(run, len(rows)) * 1e9, 'ns/call')
+
+
+def bench_compare_rows(rng):
+    boards = random_boards(rng, SAMPLES // 10)
+    def run():
+        for player, opponent in boards:
+            compare_rows(player, opponent)
+    return result(measure(run, len(boards)) * 1e9, 'ns/call')
+
+
+def bench_get_max_card(rng):
+    inputs = []
+    for row in random_rows(rng, SAMPLES, 5):
+        ranks = [card_value(code) for code in row]
+        inputs.append((ranks, Counter(ranks), hand_category(rank_hand(row))))
+    def run():
+        for ranks, frequencies, category in inputs:
+            view.get_max_card(ranks, frequencies, category)
+    return result(measure(run, len(inputs)) * 1e9, 'ns/call')
+
+
+def bench_validate_row(rng):
+    hands = []
+    for _ in range(SAMPLES):
+        sizes = [rng.randint(1, 5) for _ in range(ROWS)]
+        hands.append([[0] * size for size in sizes])
+    def run():
+        for rows in hands:
+            for row in rows:
+                validate_row(row, rows)
+    return result(measure(run, len(hands) * ROWS) * 1e9, 'ns/call')
+
+
+def bench_simulation(rng):
+    """ Complete random-vs-random games through the rules engine """
+    seeds = [rng.random() for _ in range(50)]
+    def run():
+        for seed in seeds:
+            play_game(random_policy, random_policy, random.Random(seed))
+    return result(1 / measure(run, len(seeds), min_time=MIN_TIME * 5), 'games/s', higher_is_better=True)
+
+
+def render_scene():
+    """ Sets up an offscreen window and the objects main() draws with """
+    pygame.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    width, height = SCREEN_SIZE
+    game_state = view.GameState(view.load_assets(), pygame.image.load(os.path.join('assets', 'card_back.png')).convert_alpha())
+    layout = view.board_layout(width, height)
+    background = view.build_background(width, height, view.load_background(width, height), layout)
+    buttons = view.make_buttons(height)
+    return screen, game_state, layout, background, buttons
+
+
+def fill_board(game_state, placements, seed):
+    """ Deals a fresh game and plays random placements into it """
+    game_state.rng = random.Random(seed)
+    game_state.shuffle_deck()
+    for _ in range(placements):
+        game_state.draw_card()
+        game_state.place_card(random_policy(game_state, game_state.rng))
+
+
+def bench_render(fill):
+    """ One full-screen frame of main()'s draw sequence for a board filled to BOARD_FILLS[fill] """
+    screen, game_state, layout, background, buttons = render_scene()
+    width, height = SCREEN_SIZE
+    fill_board(game_state, BOARD_FILLS[fill], fill)
+    drawn_position = (layout.draw_area_x, layout.draw_area_y['player'] - 5)
+    def run():
+        screen.set_clip(None)
+        view.draw_frame(screen, background, game_state, layout, buttons, drawn_position, None, None, None, width, height)
+    return result(measure(run, 1) * 1e3, 'ms/frame')
+
+
+BENCHMARKS = {
+    'rank_hand': bench_rank_hand,
+    'compare_rows': bench_compare_rows,
+    'get_max_card': bench_get_max_card,
+    'validate_row': bench_validate_row,
+    'simulation': bench_simulation,
+    **{f'render_{fill}': (lambda rng, fill=fill: bench_render(fill)) for fill in BOARD_FILLS}
+}
+
+
+def run_benchmarks(names, seed=0):
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](random.Random(f'{seed}:{name}'))
+        print(f'  {name:<14} {results[name]["value"]:>12.2f} {results[name]["unit"]}')
+    return {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'pygame': pygame.version.ver, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results
+    }
+
+
+def compare_runs(baseline, current, threshold):
+    """ Prints each benchmark's change between two result files and returns the names that regressed by more than threshold """
+    regressions = []
+    print(f'  {"benchmark":<14} {"baseline":>12} {"current":>12} {"change":>8}')
+    for name, old in baseline['results'].items():
+        new = current['results'].get(name)
+        if new is None:
+            continue
+        # Positive change is always worse, whichever direction the unit improves in
+        change = old['value'] / new['value'] - 1 if old['higher_is_better'] else new['value'] / old['value'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'  {name:<14} {old["value"]:>12.2f} {new["value"]:>12.2f} {change:>+8.1%} {old["unit"]}{flag}')
+    return regressions
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Times hand evaluation, game simulation and frame rendering')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='where to write the results')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown counted as a regression, 0.10 is 10%%')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline_file, open(args.compare[1]) as current_file:
+            regressions = compare_runs(json.load(baseline_file), json.load(current_file), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}: {", ".join(regressions)}')
+            sys.exit(1)
+        return
+
+    results = run_benchmarks(args.only, args.seed)
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
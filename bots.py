@@ -0,0 +1,131 @@
+# AUTHOR - MATTHEW RAYNER | LOOPBACK BOT CLIENTS
+
+
+# LIBRARIES
+import argparse
+import asyncio
+import multiprocessing
+import random
+import socket
+import time
+from engine import ROWS, Board
+from protocol import DRAWN, END, JOIN, LEFT, PLACE, PLACED, READ_SIZE, REJECTED, START, THEM, YOU, FrameParser, encode
+from server import HOST, PORT, latency_summary, run_server
+
+
+# CLASSES
+class BotStats:
+    """ Totals shared by every bot in a load test """
+    def __init__(self):
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.called_off = 0
+        self.rejected = 0
+        self.moves = 0
+        self.round_trips = []
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+
+class BotClient:
+    """ Joins matches one after another and places each drawn card into a random allowed row after think_time
+        seconds, timing how long the server takes to confirm each placement """
+    def __init__(self, stats, rng, think_time=0.0):
+        self.stats = stats
+        self.rng = rng
+        self.think_time = think_time
+
+    async def play(self, host, port, games):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        parser = FrameParser()
+        try:
+            for _ in range(games):
+                writer.write(encode(JOIN))
+                if not await self.play_match(reader, writer, parser):
+                    break
+        finally:
+            writer.close()
+
+    async def play_match(self, reader, writer, parser):
+        """ Plays until the match ends, returns False if the server hung up """
+        board = None
+        sent = None
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                return False
+            for kind, payload in parser.feed(data):
+                if kind == START:
+                    board = Board([code] for code in payload[1:1 + ROWS])
+                elif kind == DRAWN and payload[0] == YOU:
+                    if self.think_time:
+                        await asyncio.sleep(self.think_time)
+                    sent = time.perf_counter()
+                    writer.write(encode(PLACE, self.rng.choice(board.valid_rows())))
+                elif kind == PLACED and payload[0] == YOU:
+                    self.stats.round_trips.append(time.perf_counter() - sent)
+                    self.stats.moves += 1
+                    board.append(payload[1], payload[2])
+                elif kind == REJECTED:
+                    self.stats.rejected += 1
+                elif kind == END:
+                    margin = sum(winner == YOU for winner in payload) - sum(winner == THEM for winner in payload)
+                    if margin > 0:
+                        self.stats.wins += 1
+                    elif margin < 0:
+                        self.stats.losses += 1
+                    else:
+                        self.stats.draws += 1
+                    return True
+                elif kind == LEFT:
+                    self.stats.called_off += 1
+                    return True
+
+
+# FUNCTIONS
+async def run_bots(host, port, matches, games, think_time=0.0, seed=0):
+    """ Plays games matches' worth of games with 2 * matches bots connected at once, returns the BotStats """
+    stats = BotStats()
+    rng = random.Random(seed)
+    bots = [BotClient(stats, random.Random(rng.random()), think_time) for _ in range(2 * matches)]
+    await asyncio.gather(*(bot.play(host, port, games) for bot in bots))
+    return stats
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Load tests a match server with bots placing at random')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('-m', '--matches', type=int, default=1000, help='concurrent matches, two bots each')
+    parser.add_argument('-g', '--games', type=int, default=5, help='games each bot plays')
+    parser.add_argument('--think', type=float, default=0.0, help='seconds each bot waits before placing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--serve', action='store_true', help='start a server process with memory tracing for the test')
+    args = parser.parse_args()
+
+    server = stop_event = None
+    if args.serve:
+        stop_event, ready_event = multiprocessing.Event(), multiprocessing.Event()
+        server = multiprocessing.Process(target=run_server, args=(args.host, args.port), kwargs={'trace_memory': True, 'stop_event': stop_event, 'ready_event': ready_event})
+        server.start()
+        ready_event.wait()
+
+    start = time.perf_counter()
+    stats = asyncio.run(run_bots(args.host, args.port, args.matches, args.games, args.think, args.seed))
+    elapsed = time.perf_counter() - start
+    print(f'{stats.games // 2} games, {stats.moves} moves in {elapsed:.2f}s ({stats.moves / elapsed:.0f} moves/s), {stats.called_off // 2} called off, {stats.rejected} rejected')
+    if len(stats.round_trips) >= 2:
+        print('move round trip ' + latency_summary(stats.round_trips))
+
+    if server:
+        stop_event.set()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# AUTHOR - MATTHEW RAYNER | EXACT ENDGAME SOLVER
+
+
+# LIBRARIES
+import time
+from collections import namedtuple
+from engine import CARDS_PER_ROW, ROWS
+from hand_eval import card_prime, card_suit_bit, product_strength
+
+
+# CONSTANTS
+EndgameResult = namedtuple('EndgameResult', ['win', 'draw', 'loss', 'best_row'])
+FULL_BOARDS = 2 * ROWS * CARDS_PER_ROW
+
+
+# CLASSES
+class SearchLimitReached(Exception):
+    pass
+
+
+class EndgameSolver:
+    """ Solves the rest of a game exactly. Every remaining deal order is enumerated as a chance node and both sides
+        pick the placement that maximises their own expected result (a win counts 1, a draw 1/2).
+        Probabilities are always from the player's side.
+
+        Rows are searched as (prime product, suit bits, count), which is all rank_hand needs, so the transposition
+        table key (rows of both sides, side to move and the set of unseen cards) also merges rows that only differ
+        in ways that cannot change the result. A search cut short by its node or time limit keeps the positions it
+        finished, so calling again picks up where it left off. The table is emptied whenever it reaches max_entries """
+    def __init__(self, max_nodes=200000, time_limit=None, max_entries=200000):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.max_entries = max_entries
+        self.table = {}
+
+    def solve(self, game, max_nodes=None, time_limit=None, hide_drawn=False, stop=None):
+        """ Returns an EndgameResult for the game, or None if the search hit its node or time limit or stop
+            (anything with an is_set()) was set. best_row is the optimal row for game.drawn_card, None when no
+            card has been drawn or hide_drawn is set, which solves as if the drawn card were still unseen """
+        if not game.player_hand:
+            return None
+
+        self.nodes = 0
+        self.node_limit = max_nodes or self.max_nodes
+        limit = time_limit if time_limit is not None else self.time_limit
+        self.deadline = time.perf_counter() + limit if limit is not None else None
+        self.stop = stop
+
+        self.sides = [board_rows(game.player_hand), board_rows(game.opponent_hand)]
+        self.left = placements_left(game)
+        unseen = 0
+        for code in game.deck.cards:
+            unseen |= 1 << code
+        if hide_drawn and game.drawn_card is not None:
+            unseen |= 1 << game.drawn_card
+
+        try:
+            if game.drawn_card is None or hide_drawn:
+                return EndgameResult(*self.chance(unseen, game.player_turn), None)
+            outcome, best_row = self.decide(unseen, game.player_turn, game.drawn_card)
+            return EndgameResult(*outcome, best_row)
+        except SearchLimitReached:
+            return None
+
+    def chance(self, unseen, player_turn):
+        """ Expected (win, draw, loss) before the side to move draws from the unseen cards """
+        if not unseen or not self.left:
+            return self.final_outcome()
+
+        (player_products, player_suits, _), (opponent_products, opponent_suits, _) = self.sides
+        key = (*player_products, *player_suits, *opponent_products, *opponent_suits, player_turn, unseen)
+        outcome = self.table.get(key)
+        if outcome is not None:
+            return outcome
+        self.count_node()
+
+        win = draw = loss = 0.0
+        cards = 0
+        remaining = unseen
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            (card_win, card_draw, card_loss), _ = self.decide(unseen ^ bit, player_turn, bit.bit_length() - 1)
+            win += card_win
+            draw += card_draw
+            loss += card_loss
+            cards += 1
+        outcome = (win / cards, draw / cards, loss / cards)
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        self.table[key] = outcome
+        return outcome
+
+    def decide(self, unseen, player_turn, card):
+        """ Best (win, draw, loss) and row for the side to move holding card """
+        products, suits, counts = self.sides[0 if player_turn else 1]
+        prime, suit_bit = card_prime(card), card_suit_bit(card)
+        fewest = min(counts)
+        if fewest >= CARDS_PER_ROW:
+            return self.chance(unseen, not player_turn), None
+        best, best_score, best_row = None, None, None
+
+        for row_index in range(ROWS):
+            if counts[row_index] != fewest:
+                continue
+            product, row_suits = products[row_index], suits[row_index]
+            products[row_index], suits[row_index] = product * prime, row_suits & suit_bit
+            counts[row_index] += 1
+            self.left -= 1
+            try:
+                outcome = self.chance(unseen, not player_turn)
+            finally:
+                products[row_index], suits[row_index] = product, row_suits
+                counts[row_index] -= 1
+                self.left += 1
+
+            score = outcome[0] + outcome[1] / 2
+            if best is None or (score > best_score if player_turn else score < best_score):
+                best, best_score, best_row = outcome, score, row_index
+        return best, best_row
+
+    def final_outcome(self):
+        """ (win, draw, loss) of the boards as they stand """
+        (player_products, player_suits, player_counts), (opponent_products, opponent_suits, opponent_counts) = self.sides
+        score = 0
+        for i in range(ROWS):
+            player_rank = product_strength(player_products[i], player_suits[i], player_counts[i])
+            opponent_rank = product_strength(opponent_products[i], opponent_suits[i], opponent_counts[i])
+            if player_rank > opponent_rank:
+                score += 1
+            elif opponent_rank > player_rank:
+                score -= 1
+        return (1.0, 0.0, 0.0) if score > 0 else (0.0, 1.0, 0.0) if score == 0 else (0.0, 0.0, 1.0)
+
+    def count_node(self):
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise SearchLimitReached()
+        if not self.nodes % 16 and ((self.deadline is not None and time.perf_counter() > self.deadline) or (self.stop is not None and self.stop.is_set())):
+            raise SearchLimitReached()
+
+
+# FUNCTIONS
+def board_rows(board):
+    """ Reduces a Board to per-row prime products, suit bits and counts """
+    products, suits = [], []
+    for row in board:
+        product, row_suits = 1, 0xF
+        for code in row:
+            product *= card_prime(code)
+            row_suits &= card_suit_bit(code)
+        products.append(product)
+        suits.append(row_suits)
+    return products, suits, list(board.counts)
+
+
+def placements_left(game):
+    """ Cards still to be placed before both boards are full """
+    return FULL_BOARDS - sum(game.player_hand.counts) - sum(game.opponent_hand.counts)
@@ -0,0 +1,286 @@
+# AUTHOR - MATTHEW RAYNER | HEADLESS RULES ENGINE
+
+
+# LIBRARIES
+import random
+from hand_eval import RANKS, SUITS, code_rank, code_suit, evaluate
+
+
+# CONSTANTS
+ROWS = 5
+CARDS_PER_ROW = 5
+DECK_SIZE = 52
+RESULT_MESSAGES = {'player': "Players Wins!", 'opponent': "Opponent Wins!", 'draw': "It's a draw!"}
+RESULT_WINNERS = {message: winner for winner, message in RESULT_MESSAGES.items()}
+DISCARD = ROWS # Move recorded when a drawn card is replaced by drawing again instead of being placed
+
+
+# CLASSES
+class Board:
+    """ One side's rows packed into a bytearray of ROWS * CARDS_PER_ROW card codes with a fill count per row.
+        Indexing and iterating give the rows as bytearrays, cards are added with append(row_index, code) """
+    __slots__ = ('cells', 'counts')
+
+    def __init__(self, rows=()):
+        self.cells = bytearray(ROWS * CARDS_PER_ROW)
+        self.counts = bytearray(ROWS)
+        for row_index, row in enumerate(rows):
+            for code in row:
+                self.append(row_index, code)
+
+    def __len__(self):
+        return ROWS
+
+    def __bool__(self):
+        """ A board with no cards is falsy, like the empty hands before the first deal """
+        return any(self.counts)
+
+    def __getitem__(self, row_index):
+        start = row_index * CARDS_PER_ROW
+        return self.cells[start:start + self.counts[row_index]]
+
+    def __iter__(self):
+        return (self[row_index] for row_index in range(ROWS))
+
+    def append(self, row_index, code):
+        count = self.counts[row_index]
+        if count >= CARDS_PER_ROW:
+            raise ValueError(f'row {row_index} is full')
+        self.cells[row_index * CARDS_PER_ROW + count] = code
+        self.counts[row_index] = count + 1
+
+    def pop(self, row_index):
+        """ Takes the last card back out of a row """
+        count = self.counts[row_index] - 1
+        if count < 0:
+            raise IndexError(f'row {row_index} is empty')
+        self.counts[row_index] = count
+        return self.cells[row_index * CARDS_PER_ROW + count]
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.cells = self.cells[:]
+        board.counts = self.counts[:]
+        return board
+
+    def valid_rows(self):
+        """ Same as validate_row for every row, read straight from the fill counts """
+        fewest = min(self.counts)
+        if fewest >= CARDS_PER_ROW:
+            return []
+        return [row_index for row_index, count in enumerate(self.counts) if count == fewest]
+
+    def key(self):
+        """ Canonical bytes for the board, the order of cards within a row does not matter """
+        return b''.join(bytes(sorted(row)).ljust(CARDS_PER_ROW, b'\xff') for row in self)
+
+
+class Deck:
+    __slots__ = ('cards',)
+
+    def __init__(self, rng=random):
+        self.cards = []
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        """ Puts all 52 card codes back and shuffles them, reusing the same list """
+        self.cards[:] = range(DECK_SIZE)
+        rng.shuffle(self.cards)
+
+    def deal_card(self):
+        return self.cards.pop() if self.cards else None
+
+
+class Game:
+    """ The rules of a two player game with cards held as integer codes, no rendering involved.
+        Row strengths are cached and only the row a card goes into is re-ranked, so hands should
+        only be changed through shuffle_deck and place_card. version goes up on every change.
+        deal_order and moves (row indexes, or DISCARD) are kept so the game can be recorded and replayed """
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self.deck = Deck(self.rng)
+        self.player_hand = Board()
+        self.opponent_hand = Board()
+        self.player_turn = True
+        self.drawn_card = None
+        self.version = 0
+        self.player_strengths = []
+        self.opponent_strengths = []
+        self.cards_placed = 0
+        self.comparison_version = None
+        self.cached_comparison = None
+        self.deal_order = b''
+        self.moves = bytearray()
+
+    def draw_card(self):
+        if self.deck.cards:
+            if self.drawn_card is not None:
+                self.moves.append(DISCARD)
+            self.drawn_card = self.deck.deal_card()
+
+    def shuffle_deck(self):
+        self.deck.reset(self.rng)
+        self.deal_hands()
+
+    def deal_hands(self):
+        """ Starts a game from the deck as it is, dealing one card into each row for both sides """
+        self.deal_order = bytes(reversed(self.deck.cards))
+        self.moves = bytearray()
+        self.player_hand = Board([self.deck.deal_card()] for _ in range(ROWS))
+        self.opponent_hand = Board([self.deck.deal_card()] for _ in range(ROWS))
+        self.drawn_card = None
+        self.player_turn = True
+        self.player_strengths = [rank_hand(row) for row in self.player_hand]
+        self.opponent_strengths = [rank_hand(row) for row in self.opponent_hand]
+        self.cards_placed = 2 * ROWS
+        self.version += 1
+
+    def current_hand(self):
+        return self.player_hand if self.player_turn else self.opponent_hand
+
+    def valid_rows(self, hand=None):
+        """ Returns the indexes of the rows the next card may be placed into """
+        hand = self.current_hand() if hand is None else hand
+        if isinstance(hand, Board):
+            return hand.valid_rows()
+        fewest = min_cards_in_row(hand)
+        if fewest >= CARDS_PER_ROW:
+            return []
+        return [i for i, row in enumerate(hand) if len(row) == fewest]
+
+    def place_card(self, row_index):
+        """ Places the drawn card into a row for the side to move and passes the turn, returns False if not allowed """
+        hand = self.current_hand()
+        if self.drawn_card is None or row_index not in hand.valid_rows():
+            return False
+        hand.append(row_index, self.drawn_card)
+        self.moves.append(row_index)
+        strengths = self.player_strengths if self.player_turn else self.opponent_strengths
+        strengths[row_index] = rank_hand(hand[row_index])
+        self.cards_placed += 1
+        self.version += 1
+        self.drawn_card = None
+        self.player_turn = not self.player_turn
+        return True
+
+    def comparison(self):
+        """ compare_rows for the current board, worked out once per version from the cached row strengths """
+        if not self.player_hand:
+            return None
+        if self.comparison_version != self.version:
+            self.cached_comparison = compare_strengths(self.player_strengths, self.opponent_strengths)
+            self.comparison_version = self.version
+        return self.cached_comparison
+
+    def snapshot(self):
+        """ A detached copy of the rules state, safe to hand to another thread or process. It gets its own RNG """
+        game = Game.__new__(Game)
+        game.rng = random.Random(self.version)
+        game.deck = Deck.__new__(Deck)
+        game.deck.cards = self.deck.cards[:]
+        game.player_hand = self.player_hand.copy()
+        game.opponent_hand = self.opponent_hand.copy()
+        game.player_turn = self.player_turn
+        game.drawn_card = self.drawn_card
+        game.version = self.version
+        game.player_strengths = self.player_strengths[:]
+        game.opponent_strengths = self.opponent_strengths[:]
+        game.cards_placed = self.cards_placed
+        game.comparison_version = None
+        game.cached_comparison = None
+        game.deal_order = self.deal_order
+        game.moves = self.moves[:]
+        return game
+
+    def position_key(self):
+        """ Canonical bytes for both boards, the drawn card and the side to move """
+        drawn_card = 0xFF if self.drawn_card is None else self.drawn_card
+        return self.player_hand.key() + self.opponent_hand.key() + bytes((drawn_card, self.player_turn))
+
+    def result(self):
+        """ Same as check_game_end, None until every row on both sides is full """
+        if self.cards_placed < 2 * ROWS * CARDS_PER_ROW:
+            return None
+        return self.comparison()
+
+
+# FUNCTIONS
+def card_name(code):
+    """ Returns the (rank, suit) strings for a card code """
+    return RANKS[code_rank(code)], SUITS[code_suit(code)]
+
+
+def card_value(code):
+    """ Returns the rank value (2 - 14) of a card code """
+    return code_rank(code) + 2
+
+
+def min_cards_in_row(rows):
+    """ Returns the current minimum number of cards in the rows """
+    return min(len(row) for row in rows)
+
+
+def validate_row(row, rows):
+    """ Checks if a card can be placed in the chosen row, using the minimum number of cards """
+    return len(row) == min_cards_in_row(rows) and len(row) < CARDS_PER_ROW
+
+
+def rank_hand(hand):
+    """ Evaluates a row of card codes and returns a packed integer strength for comparison """
+    return evaluate(hand)
+
+
+def compare_rows(player_hand, opponent_hand):
+    """ Compares all rows and determines the overall winner """
+    return compare_strengths([rank_hand(row) for row in player_hand], [rank_hand(row) for row in opponent_hand])
+
+
+def compare_strengths(player_strengths, opponent_strengths):
+    """ compare_rows for rows that have already been ranked """
+    player_wins = 0
+    opponent_wins = 0
+    row_wins = {}
+
+    for i in range(ROWS):
+        player_rank = player_strengths[i]
+        opponent_rank = opponent_strengths[i]
+
+        if player_rank > opponent_rank:
+            player_wins += 1
+            row_wins[i] = 'player'
+        elif opponent_rank > player_rank:
+            opponent_wins += 1
+            row_wins[i] = 'opponent'
+        else:
+            row_wins[i] = 'draw'
+
+    if player_wins > opponent_wins:
+        return [RESULT_MESSAGES['player'], row_wins]
+    elif opponent_wins > player_wins:
+        return [RESULT_MESSAGES['opponent'], row_wins]
+    else:
+        return [RESULT_MESSAGES['draw'], row_wins]
+
+
+def check_game_end(player_hand, opponent_hand):
+    """ Checks if all rows are full and determines the winner """
+    if all(len(row) == CARDS_PER_ROW for row in player_hand) and all(len(row) == CARDS_PER_ROW for row in opponent_hand) and player_hand and opponent_hand:
+        return compare_rows(player_hand, opponent_hand)
+    return None
+
+
+def play_game(player_policy, opponent_policy, rng, game=None):
+    """ Plays a full game between two placement policies and returns the compare_rows result,
+        into game when one is given so the caller can keep it """
+    if game is None:
+        game = Game(rng)
+    game.shuffle_deck()
+    result = None
+    while result is None:
+        game.draw_card()
+        if game.drawn_card is None:
+            break
+        policy = player_policy if game.player_turn else opponent_policy
+        game.place_card(policy(game, rng))
+        result = game.result()
+    return result
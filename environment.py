@@ -0,0 +1,226 @@
+# AUTHOR - MATTHEW RAYNER | PLACEMENT AGENT ENVIRONMENTS
+
+
+# LIBRARIES
+import argparse
+import random
+import time
+import numpy as np
+from batch_eval import EMPTY
+from engine import CARDS_PER_ROW, DECK_SIZE, RESULT_WINNERS, ROWS, Game
+from hand_table import BINOMIAL, SECTION_SIZES, SECTION_STARTS, TABLE_FILE, load_table, strength_classes
+from policies import POLICIES
+
+
+# Both environments follow the Gym API with the agent as the player: reset(seed) returns (observation, info) and
+# step(row) returns (observation, reward, terminated, truncated, info), info['action_mask'] marks the legal rows.
+# An observation is OBSERVATION_SIZE card codes: the player's rows, then the opponent's, each CARDS_PER_ROW slots
+# in the order the cards were placed with EMPTY for open slots, then the drawn card to place.
+# The reward is 1 for a won game, -1 for a lost one and 0 otherwise, given on the last step
+
+# CONSTANTS
+OBSERVATION_SIZE = 2 * ROWS * CARDS_PER_ROW + 1
+DEALT = 2 * ROWS # Cards dealt before the first draw
+GAME_STEPS = ROWS * (CARDS_PER_ROW - 1) # Every game is exactly this many agent placements
+REWARDS = {'player': 1.0, 'opponent': -1.0, 'draw': 0.0}
+VECTOR_OPPONENTS = ['random', 'table']
+BINOMIAL_ARRAY = np.array(BINOMIAL, dtype=np.int64)
+_HAND_CLASSES = []
+
+
+# CLASSES
+class PlacementEnv:
+    """ One game through the rules engine, the opponent is any policy from policies.POLICIES or a policy callable """
+    def __init__(self, opponent='random', seed=None):
+        self.opponent = POLICIES[opponent] if isinstance(opponent, str) else opponent
+        self.rng = random.Random(seed)
+        self.game = Game(self.rng)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.game.shuffle_deck()
+        self.game.draw_card()
+        return self.observation(), {'action_mask': self.action_mask()}
+
+    def step(self, row):
+        game = self.game
+        if not game.player_turn or not game.place_card(row):
+            raise ValueError(f'row {row} is not a legal placement, check the action mask or reset a finished game')
+        result = game.result()
+        if result is None:
+            game.draw_card()
+            game.place_card(self.opponent(game, self.rng))
+            result = game.result()
+        if result is None:
+            game.draw_card()
+            return self.observation(), 0.0, False, False, {'action_mask': self.action_mask()}
+        return self.observation(), REWARDS[RESULT_WINNERS[result[0]]], True, False, {'action_mask': self.action_mask(), 'result': result}
+
+    def observation(self):
+        observation = np.full(OBSERVATION_SIZE, EMPTY, dtype=np.int8)
+        for side, board in enumerate((self.game.player_hand, self.game.opponent_hand)):
+            for row_index, row in enumerate(board):
+                start = (side * ROWS + row_index) * CARDS_PER_ROW
+                observation[start:start + len(row)] = list(row)
+        if self.game.drawn_card is not None:
+            observation[-1] = self.game.drawn_card
+        return observation
+
+    def action_mask(self):
+        mask = np.zeros(ROWS, dtype=bool)
+        if self.game.player_turn and self.game.drawn_card is not None:
+            mask[self.game.valid_rows()] = True
+        return mask
+
+
+class VectorPlacementEnv:
+    """ num_envs games stepped in lock-step over arrays, with no Game objects involved. Rows fill in rounds and
+        every game lasts GAME_STEPS steps, so all games are always at the same turn, every legal row holds the
+        same number of cards and all games finish together. Finished games are dealt again within the same step,
+        the observation returned is then the new game's and info['final_observation'] the finished boards.
+        The opponent is 'random' or 'table', the greedy policies.TablePolicy over the hand table's NumPy view.
+        Finished boards are scored from a strength class per hand, which takes a few seconds to build the first time """
+    def __init__(self, num_envs, opponent='random', seed=None, table_path=TABLE_FILE):
+        if opponent not in VECTOR_OPPONENTS:
+            raise ValueError(f'opponent must be one of {VECTOR_OPPONENTS}, got {opponent!r}')
+        self.num_envs = num_envs
+        self.opponent = opponent
+        self.rng = np.random.default_rng(seed)
+        self.odds = None
+        if opponent == 'table':
+            table = load_table(table_path)
+            if table is None:
+                raise FileNotFoundError(f'{table_path} not found or not a hand table, build it with python hand_table.py build')
+            self.odds = table.odds_array()
+        self.hand_classes = hand_classes()
+        self.envs = np.arange(num_envs)
+        self.decks = np.empty((num_envs, DECK_SIZE), dtype=np.int8)
+        self.cells = np.empty((num_envs, 2, ROWS, CARDS_PER_ROW), dtype=np.int8)
+        self.counts = np.empty((num_envs, 2, ROWS), dtype=np.int8)
+        self.turn = 0
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.deal()
+        return self.observation(), {'action_mask': self.action_mask()}
+
+    def deal(self):
+        """ Shuffles every deck and deals one card into each row for both sides, decks are kept in deal order """
+        self.decks[:] = np.arange(DECK_SIZE, dtype=np.int8)
+        self.rng.permuted(self.decks, axis=1, out=self.decks)
+        self.cells.fill(EMPTY)
+        self.cells[:, :, :, 0] = self.decks[:, :DEALT].reshape(self.num_envs, 2, ROWS)
+        self.counts.fill(1)
+        self.turn = 0
+
+    def row_fill(self):
+        """ Cards in each legal row this turn, the same for every game and both sides """
+        return 1 + self.turn // ROWS
+
+    def action_mask(self):
+        return self.counts[:, 0] == self.row_fill()
+
+    def observation(self):
+        drawn_cards = self.decks[:, DEALT + 2 * self.turn]
+        return np.concatenate((self.cells.reshape(self.num_envs, -1), drawn_cards[:, np.newaxis]), axis=1)
+
+    def place(self, side, rows, cards):
+        fill = self.row_fill()
+        self.cells[self.envs, side, rows, fill] = cards
+        self.counts[self.envs, side, rows] = fill + 1
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs,) or actions.min() < 0 or actions.max() >= ROWS or not self.action_mask()[self.envs, actions].all():
+            raise ValueError('every action has to be a legal row, check the action mask')
+        self.place(0, actions, self.decks[:, DEALT + 2 * self.turn])
+
+        card = self.decks[:, DEALT + 2 * self.turn + 1]
+        legal = self.counts[:, 1] == self.row_fill()
+        if self.opponent == 'table':
+            scores = self.table_gains(card)
+        else:
+            scores = self.rng.random((self.num_envs, ROWS))
+        self.place(1, np.where(legal, scores, -np.inf).argmax(axis=1), card)
+        self.turn += 1
+
+        if self.turn < GAME_STEPS:
+            rewards = np.zeros(self.num_envs, dtype=np.float32)
+            return self.observation(), rewards, np.zeros(self.num_envs, dtype=bool), np.zeros(self.num_envs, dtype=bool), {'action_mask': self.action_mask()}
+
+        # compare_rows over the full boards, then a new deal for every game
+        strengths = self.hand_classes[row_indexes(np.sort(self.cells, axis=3))].astype(np.int32)
+        row_winners = np.sign(strengths[:, 0] - strengths[:, 1])
+        rewards = np.sign(row_winners.sum(axis=1)).astype(np.float32)
+        final_observation = np.concatenate((self.cells.reshape(self.num_envs, -1), np.full((self.num_envs, 1), EMPTY, dtype=np.int8)), axis=1)
+        self.deal()
+        info = {'action_mask': self.action_mask(), 'final_observation': final_observation}
+        return self.observation(), rewards, np.ones(self.num_envs, dtype=bool), np.zeros(self.num_envs, dtype=bool), info
+
+    def table_gains(self, card):
+        """ How much the card adds to each of the opponent's rows' win chance, like TablePolicy.
+            Only the legal rows' gains matter and those rows all hold row_fill() cards """
+        fill = self.row_fill()
+        rows = np.sort(self.cells[:, 1, :, :fill], axis=2)
+        grown = np.sort(np.concatenate((rows, np.broadcast_to(card[:, np.newaxis, np.newaxis], (self.num_envs, ROWS, 1))), axis=2), axis=2)
+        return self.win_chances(grown) - self.win_chances(rows)
+
+    def win_chances(self, rows):
+        """ hand_table win_chance of an (..., k) array of sorted card codes """
+        odds = self.odds[SECTION_STARTS[rows.shape[-1]] + row_indexes(rows)]
+        return odds[..., 1] + odds[..., 2] / 2.0
+
+
+# FUNCTIONS
+def hand_classes():
+    """ The dense strength class of every 5-card hand indexed by hand_table.row_index, shared by every environment in the process """
+    if not _HAND_CLASSES:
+        hands, classes, _ = strength_classes()
+        lookup = np.empty(SECTION_SIZES[CARDS_PER_ROW], dtype=np.int16)
+        lookup[row_indexes(hands)] = classes
+        _HAND_CLASSES.append(lookup)
+    return _HAND_CLASSES[0]
+
+
+def row_indexes(rows):
+    """ hand_table.row_index of an (..., k) array of sorted card codes """
+    index = np.zeros(rows.shape[:-1], dtype=np.int64)
+    for i in range(rows.shape[-1]):
+        index += BINOMIAL_ARRAY[rows[..., i], i + 1]
+    return index
+
+
+def random_actions(rng, mask):
+    """ A uniformly random legal row for every game in a batch """
+    return np.where(mask, rng.random(mask.shape), -1.0).argmax(axis=1)
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Measures vectorized environment throughput with a random agent')
+    parser.add_argument('--envs', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=2000, help='lock-step steps to run, each steps every game once')
+    parser.add_argument('--opponent', choices=VECTOR_OPPONENTS, default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env = VectorPlacementEnv(args.envs, args.opponent, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    _, info = env.reset()
+    rewards = np.zeros(3, dtype=np.int64)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, reward, terminated, _, info = env.step(random_actions(rng, info['action_mask']))
+        if terminated[0]:
+            rewards += np.bincount((reward + 1).astype(np.int64), minlength=3)
+    elapsed = time.perf_counter() - start
+    games = rewards.sum()
+    print(f'{args.envs * args.steps} steps in {elapsed:.2f}s ({args.envs * args.steps / elapsed:,.0f} steps/s)')
+    if games:
+        print(f'{games} games vs {args.opponent}: {rewards[2] / games:.2%} won, {rewards[1] / games:.2%} drawn, {rewards[0] / games:.2%} lost')
+
+
+if __name__ == "__main__":
+    main()
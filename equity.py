@@ -0,0 +1,142 @@
+# AUTHOR - MATTHEW RAYNER | MONTE CARLO ROW EQUITY
+
+
+# LIBRARIES
+import random
+import time
+from endgame import EndgameSolver, placements_left
+from engine import CARDS_PER_ROW, ROWS
+from hand_eval import evaluate
+
+
+# CLASSES
+class EquityEstimator:
+    """ Estimates each row's and the match's win chances by sampling completions of both boards.
+        Samples accumulate across frames until a card is placed, then the estimate starts over.
+        The opponent's drawn card is never looked at, it is treated as one of the unseen cards.
+        With exact_placements or fewer cards left to place the match chance comes from the EndgameSolver instead,
+        solved within the same frame_budget as the sampling, which carries on for the row chances """
+    def __init__(self, frame_budget=0.002, max_samples=20000, rng=None, exact_placements=6):
+        self.frame_budget = frame_budget
+        self.max_samples = max_samples
+        self.rng = rng or random.Random()
+        self.exact_placements = exact_placements
+        self.solver = EndgameSolver(max_nodes=10000000)
+        self.key = None
+        self.deal = None
+        self.reset()
+
+    def reset(self, game=None):
+        self.samples = 0
+        self.row_wins = [0] * ROWS
+        self.row_draws = [0] * ROWS
+        self.match_wins = 0
+        self.match_draws = 0
+        self.exact = None
+        self.wants_exact = False
+        self.unseen = list(game.deck.cards) if game else []
+        # Positions from an earlier deal can never come back
+        if game and (id(game), game.deal_order) != self.deal:
+            self.deal = (id(game), game.deal_order)
+            self.solver.table.clear()
+        if game and not game.player_turn and game.drawn_card is not None:
+            self.unseen.append(game.drawn_card)
+
+    def update(self, game):
+        """ Spends up to frame_budget seconds adding samples for the current position """
+        if not game.player_hand:
+            return
+        key = (id(game), game.version, game.drawn_card if game.player_turn else None)
+        if key != self.key:
+            self.key = key
+            self.reset(game)
+
+        # The solver gets up to half the frame, sampling the rest of it
+        deadline = time.perf_counter() + self.frame_budget
+        self.wants_exact = placements_left(game) <= self.exact_placements
+        if self.exact is None and self.wants_exact:
+            self.exact = self.solver.solve(game, time_limit=self.frame_budget / 2, hide_drawn=not game.player_turn)
+
+        while self.samples < self.max_samples and time.perf_counter() < deadline:
+            for _ in range(4):
+                self.sample(game)
+
+    def sample(self, game):
+        """ Plays out one random completion of both boards and records who wins each row """
+        player = [list(row) for row in game.player_hand]
+        opponent = [list(row) for row in game.opponent_hand]
+        cards = self.unseen
+        self.rng.shuffle(cards)
+
+        # The player's drawn card is known and can only go into a row validate_row allows
+        if game.player_turn and game.drawn_card is not None:
+            fewest = min(len(row) for row in player)
+            open_rows = [row for row in player if len(row) == fewest and fewest < CARDS_PER_ROW]
+            if open_rows:
+                self.rng.choice(open_rows).append(game.drawn_card)
+
+        fill_open_slots(player, opponent, cards)
+        score = 0
+        for i in range(ROWS):
+            player_rank = evaluate(player[i])
+            opponent_rank = evaluate(opponent[i])
+            if player_rank > opponent_rank:
+                self.row_wins[i] += 1
+                score += 1
+            elif player_rank == opponent_rank:
+                self.row_draws[i] += 1
+            else:
+                score -= 1
+
+        if score > 0:
+            self.match_wins += 1
+        elif score == 0:
+            self.match_draws += 1
+        self.samples += 1
+
+    def converged(self):
+        """ True once the row chances have every sample and the match chance is exact when it can be """
+        return self.samples >= self.max_samples and (self.exact is not None or not self.wants_exact)
+
+    def row_win_rate(self, row_index):
+        """ The player's chance of winning a row, counting draws as half """
+        if not self.samples:
+            return None
+        return (self.row_wins[row_index] + self.row_draws[row_index] / 2) / self.samples
+
+    def match_is_exact(self):
+        """ True once the match chance is the solved value with both sides playing their best, the row chances
+            are always for random completions so the two no longer follow the same play """
+        return self.exact is not None
+
+    def match_win_rate(self):
+        """ The player's chance of winning the match, exact once the endgame has been solved """
+        if self.exact is not None:
+            return self.exact.win + self.exact.draw / 2
+        if not self.samples:
+            return None
+        return (self.match_wins + self.match_draws / 2) / self.samples
+
+
+# FUNCTIONS
+def fill_open_slots(player, opponent, cards):
+    """ Deals shuffled cards into every open slot of both boards in place. Unseen cards are interchangeable,
+        so this gives the same final boards as playing the placements out one by one """
+    dealt = 0
+    for row in player + opponent:
+        needed = CARDS_PER_ROW - len(row)
+        row.extend(cards[dealt:dealt + needed])
+        dealt += needed
+
+
+def board_score(player, opponent):
+    """ Returns rows won by the player minus rows won by the opponent """
+    score = 0
+    for player_row, opponent_row in zip(player, opponent):
+        player_rank = evaluate(player_row)
+        opponent_rank = evaluate(opponent_row)
+        if player_rank > opponent_rank:
+            score += 1
+        elif opponent_rank > player_rank:
+            score -= 1
+    return score
@@ -0,0 +1,176 @@
+# AUTHOR - MATTHEW RAYNER | HAND EVALUATOR
+
+
+# LIBRARIES
+from itertools import combinations, combinations_with_replacement
+
+
+# CONSTANTS
+# Suits follow the row order of the card_designs.png sprite sheet and ranks follow its columns,
+# so a card code (0-51) is simply suit_index * 13 + rank_index
+SUITS = ['Hearts', 'Clubs', 'Diamonds', 'Spades']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+RANK_VALUES = list(range(2, 15))
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+
+HIGH_CARD = 1
+PAIR = 2
+TWO_PAIR = 3
+THREE_OF_A_KIND = 4
+STRAIGHT = 5
+FLUSH = 6
+FULL_HOUSE = 7
+FOUR_OF_A_KIND = 8
+STRAIGHT_FLUSH = 9
+ROYAL_FLUSH = 10
+CATEGORY_NAMES = {
+    0: '',
+    HIGH_CARD: 'High',
+    PAIR: 'Pair',
+    TWO_PAIR: 'Two Pair',
+    THREE_OF_A_KIND: 'Three of a Kind',
+    STRAIGHT: 'Straight',
+    FLUSH: 'Flush',
+    FULL_HOUSE: 'Full House',
+    FOUR_OF_A_KIND: 'Four of a Kind',
+    STRAIGHT_FLUSH: 'Straight Flush',
+    ROYAL_FLUSH: 'Royal Flush'
+}
+
+# A strength is category << 20 followed by five 4-bit tie-break ranks, grouped by count and then rank
+CATEGORY_SHIFT = 20
+WHEEL_MASK = 0b1000000001111 # A-2-3-4-5
+
+
+# FUNCTIONS
+def card_code(rank, suit):
+    """ Returns the compact integer code for a rank/suit pair, e.g. ('K', 'Hearts') """
+    return SUITS.index(suit) * 13 + RANKS.index(rank)
+
+
+def code_rank(code):
+    """ Returns the rank index (0 = '2', 12 = 'A') of a card code """
+    return code % 13
+
+
+def code_suit(code):
+    """ Returns the suit index of a card code """
+    return code // 13
+
+
+def pack_strength(category, tiebreak):
+    """ Packs a category and up to five tie-break rank values into a single comparable integer """
+    strength = category
+    for i in range(5):
+        strength = (strength << 4) | (tiebreak[i] if i < len(tiebreak) else 0)
+    return strength
+
+
+def hand_category(strength):
+    """ Returns the category (1 = High ... 10 = Royal Flush) of a packed strength """
+    return strength >> CATEGORY_SHIFT
+
+
+def hand_name(strength):
+    """ Returns the display name of a packed strength, e.g. 'Full House' """
+    return CATEGORY_NAMES[strength >> CATEGORY_SHIFT]
+
+
+def _straight_high(rank_mask):
+    """ Returns the top card value of a five distinct rank straight, or 0 if it is not a straight """
+    if rank_mask == WHEEL_MASK:
+        return 5
+    low = (rank_mask & -rank_mask).bit_length() - 1
+    if rank_mask == 0b11111 << low:
+        return low + 6
+    return 0
+
+
+def _rank_strength(rank_indexes, flush):
+    """ Scores a multiset of rank indexes the slow way, used only when building the tables """
+    values = [RANK_VALUES[r] for r in rank_indexes]
+    counts = {v: values.count(v) for v in values}
+    grouped = sorted(values, key=lambda v: (counts[v], v), reverse=True)
+    frequencies = sorted(counts.values(), reverse=True)
+
+    high = 0
+    if len(values) == 5 and len(counts) == 5:
+        high = _straight_high(sum(1 << r for r in rank_indexes))
+    straight_cards = [high - i if high - i > 1 else 1 for i in range(5)]
+
+    if flush and high == 14:
+        return pack_strength(ROYAL_FLUSH, straight_cards)
+    elif flush and high:
+        return pack_strength(STRAIGHT_FLUSH, straight_cards)
+    elif frequencies[0] == 4:
+        return pack_strength(FOUR_OF_A_KIND, grouped)
+    elif frequencies == [3, 2]:
+        return pack_strength(FULL_HOUSE, grouped)
+    elif flush:
+        return pack_strength(FLUSH, grouped)
+    elif high:
+        return pack_strength(STRAIGHT, straight_cards)
+    elif frequencies[0] == 3:
+        return pack_strength(THREE_OF_A_KIND, grouped)
+    elif frequencies[:2] == [2, 2]:
+        return pack_strength(TWO_PAIR, grouped)
+    elif frequencies[0] == 2:
+        return pack_strength(PAIR, grouped)
+    return pack_strength(HIGH_CARD, grouped)
+
+
+def _build_tables():
+    """ Builds the prime-product lookup tables for every row of 0-5 cards """
+    strength = {1: 0}
+    flush_strength = {}
+
+    for size in range(1, 6):
+        for rank_indexes in combinations_with_replacement(range(13), size):
+            if max(rank_indexes.count(r) for r in rank_indexes) > 4:
+                continue
+            product = 1
+            for r in rank_indexes:
+                product *= PRIMES[r]
+            strength[product] = _rank_strength(rank_indexes, False)
+
+    for rank_indexes in combinations(range(13), 5):
+        product = 1
+        for r in rank_indexes:
+            product *= PRIMES[r]
+        flush_strength[product] = _rank_strength(rank_indexes, True)
+
+    return strength, flush_strength
+
+
+_STRENGTH, _FLUSH_STRENGTH = _build_tables()
+_CODE_PRIMES = [PRIMES[code % 13] for code in range(52)]
+_CODE_SUIT_BITS = [1 << (code // 13) for code in range(52)]
+
+
+def evaluate(codes):
+    """ Returns the packed strength of a row of 0-5 card codes, higher is better """
+    product = 1
+    suits = 0xF
+    for code in codes:
+        product *= _CODE_PRIMES[code]
+        suits &= _CODE_SUIT_BITS[code]
+
+    if suits and len(codes) == 5:
+        return _FLUSH_STRENGTH[product]
+    return _STRENGTH[product]
+
+
+def card_prime(code):
+    """ The prime standing for a card's rank, a row's rank multiset is the product of its primes """
+    return _CODE_PRIMES[code]
+
+
+def card_suit_bit(code):
+    return _CODE_SUIT_BITS[code]
+
+
+def product_strength(product, suits, count):
+    """ evaluate() for a row already reduced to its prime product, the AND of its suit bits and its card count """
+    if suits and count == 5:
+        return _FLUSH_STRENGTH[product]
+    return _STRENGTH[product]
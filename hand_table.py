@@ -0,0 +1,231 @@
+# AUTHOR - MATTHEW RAYNER | PRECOMPUTED HAND ODDS
+
+
+# LIBRARIES
+import argparse
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+from itertools import chain, combinations
+from math import comb
+from engine import CARDS_PER_ROW, DECK_SIZE
+from hand_eval import RANKS, SUITS
+
+
+# The table holds an entry for every row of 0-5 cards, 2,893,164 in all, so any row is one lookup away:
+#   8 bytes     header, the magic and the number of entries
+#   6 bytes     per entry, percentile, win and draw chance as little-endian uint16 fractions of ODDS_SCALE
+# Entries are grouped by card count and ordered within a group by the colex rank of the row's sorted codes.
+# win and draw are against a random completed row dealt from the cards left once this row is completed at random.
+# The percentile of a full row is its strength's standing among all 2,598,960 hands, counting ties as half,
+# and of a partial row its win chance's standing among all rows with the same number of cards
+
+# CONSTANTS
+RowOdds = namedtuple('RowOdds', ['percentile', 'win', 'draw'])
+TABLE_FILE = 'hand_table.bin'
+MAGIC = b'HTB1'
+HEADER = struct.Struct('<4sI')
+ENTRY = struct.Struct('<3H')
+ODDS_SCALE = 65535
+BINOMIAL = [[comb(n, k) for k in range(CARDS_PER_ROW + 1)] for n in range(DECK_SIZE + 1)]
+SECTION_SIZES = [BINOMIAL[DECK_SIZE][k] for k in range(CARDS_PER_ROW + 1)]
+SECTION_STARTS = [sum(SECTION_SIZES[:k]) for k in range(CARDS_PER_ROW + 1)]
+TABLE_ENTRIES = sum(SECTION_SIZES)
+_TABLES = {}
+
+
+# CLASSES
+class HandTable:
+    """ Read-only view of a table file. The file is memory-mapped rather than read, so opening it costs nothing
+        and every process using the same file shares one copy through the page cache """
+    def __init__(self, path=TABLE_FILE):
+        self.path = path
+        with open(path, 'rb') as table_file:
+            self.data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size or HEADER.unpack_from(self.data) != (MAGIC, TABLE_ENTRIES) or len(self.data) != HEADER.size + TABLE_ENTRIES * ENTRY.size:
+            self.data.close()
+            raise ValueError(f'{path} is not a hand table, rebuild it with python hand_table.py build')
+
+    def lookup(self, codes):
+        """ RowOdds of a row of 0-5 card codes in any order """
+        index = SECTION_STARTS[len(codes)] + row_index(codes)
+        return RowOdds(*(value / ODDS_SCALE for value in ENTRY.unpack_from(self.data, HEADER.size + index * ENTRY.size)))
+
+    def win_chance(self, codes):
+        """ Chance the row beats a random completed row, counting a draw as half a win """
+        _, win, draw = self.lookup(codes)
+        return win + draw / 2
+
+    def odds_array(self):
+        """ The entries as a (TABLE_ENTRIES, 3) NumPy uint16 array over the same mapping, for batched lookups """
+        import numpy as np
+        return np.frombuffer(self.data, dtype='<u2', offset=HEADER.size).reshape(TABLE_ENTRIES, 3)
+
+    def close(self):
+        self.data.close()
+
+
+# FUNCTIONS
+def row_index(codes):
+    """ The colex rank of a set of card codes among all sets of the same size """
+    return sum(BINOMIAL[code][i + 1] for i, code in enumerate(sorted(codes)))
+
+
+def load_table(path=TABLE_FILE):
+    """ The process's shared HandTable for path, or None if the table has not been built or cannot be read as one """
+    if path not in _TABLES:
+        table = None
+        if os.path.exists(path):
+            try:
+                table = HandTable(path)
+            except (OSError, ValueError) as error: # Unreadable, truncated or from another version, mmap also refuses an empty file
+                print(f'Hand table {path} not loaded: {error}')
+        _TABLES[path] = table
+    return _TABLES[path]
+
+
+def parse_card(text):
+    """ Card code of a name such as 'AS', '10h' or 'qd' """
+    rank, suit = text[:-1].upper(), text[-1].upper()
+    suit_names = [name[0] for name in SUITS]
+    if rank not in RANKS or suit not in suit_names:
+        raise ValueError(f'unknown card {text!r}, expected a rank from {"".join(RANKS)} followed by one of {"".join(suit_names)}')
+    return suit_names.index(suit) * 13 + RANKS.index(rank)
+
+
+def strength_classes():
+    """ Every 5-card hand as an (N, 5) NumPy array of sorted codes, with the dense strength class of each, 0 the weakest,
+        and the number of hands in each class. Hands come in itertools.combinations order, not row_index order """
+    import numpy as np
+    from batch_eval import evaluate_batch
+
+    hand_count = SECTION_SIZES[CARDS_PER_ROW]
+    hands = np.fromiter(chain.from_iterable(combinations(range(DECK_SIZE), CARDS_PER_ROW)), dtype=np.int16, count=hand_count * CARDS_PER_ROW)
+    hands = hands.reshape(hand_count, CARDS_PER_ROW)
+    strengths, _ = evaluate_batch(hands)
+    _, classes, class_counts = np.unique(strengths, return_inverse=True, return_counts=True)
+    return hands, classes, class_counts
+
+
+def build_table(path=TABLE_FILE):
+    """ Works out every entry and writes the table file, takes a minute or less and a couple of GB of memory.
+        Only building needs NumPy, reading the table does not """
+    import numpy as np
+
+    # Strengths become dense classes so hands can be counted by class
+    hands, classes, class_counts = strength_classes()
+    hand_count = len(hands)
+    class_count = len(class_counts)
+    binomial = np.array(BINOMIAL, dtype=np.int64)
+
+    def subset_index(columns):
+        """ row_index of the cards in the given columns of every hand, hands are already sorted """
+        index = np.zeros(hand_count, dtype=np.int64)
+        for i, column in enumerate(columns):
+            index += binomial[hands[:, column], i + 1]
+        return index
+
+    weaker = np.concatenate(([0], np.cumsum(class_counts)[:-1]))[classes]
+    equal = class_counts[classes]
+    percentile = (weaker + equal / 2) / hand_count
+
+    # Hands that share no card with a hand H, by inclusion-exclusion over the subsets S of H:
+    # sum of (-1)^|S| times the hands containing S that are weaker than (or as strong as) H
+    wins = weaker.astype(np.int64)
+    draws = equal.astype(np.int64)
+    for size in range(1, CARDS_PER_ROW):
+        patterns = list(combinations(range(CARDS_PER_ROW), size))
+        keys = np.concatenate([subset_index(columns) * class_count + classes for columns in patterns])
+        order = np.argsort(keys)
+        keys = keys[order]
+        positions = np.arange(len(keys))
+        new_key = np.concatenate(([True], keys[1:] != keys[:-1]))
+        new_subset = np.concatenate(([True], keys[1:] // class_count != keys[:-1] // class_count))
+        key_starts = np.flatnonzero(new_key)
+        run_lengths = np.diff(np.append(key_starts, len(keys)))
+
+        sorted_weaker = np.maximum.accumulate(np.where(new_key, positions, 0)) - np.maximum.accumulate(np.where(new_subset, positions, 0))
+        sorted_equal = run_lengths[np.cumsum(new_key) - 1]
+        subset_weaker = np.empty_like(sorted_weaker)
+        subset_equal = np.empty_like(sorted_equal)
+        subset_weaker[order] = sorted_weaker
+        subset_equal[order] = sorted_equal
+        del keys, order, positions, new_key, new_subset, sorted_weaker, sorted_equal
+
+        sign = -1 if size % 2 else 1
+        wins += sign * subset_weaker.reshape(len(patterns), hand_count).sum(axis=0)
+        draws += sign * subset_equal.reshape(len(patterns), hand_count).sum(axis=0)
+    draws -= 1 # S = H, the hand only ties itself
+
+    opponents = BINOMIAL[DECK_SIZE - CARDS_PER_ROW][CARDS_PER_ROW]
+    win = wins / opponents
+    draw = draws / opponents
+
+    # A partial row's chances are the average over its equally likely completions
+    sections = []
+    for size in range(CARDS_PER_ROW):
+        section_win = np.zeros(SECTION_SIZES[size])
+        section_draw = np.zeros(SECTION_SIZES[size])
+        for columns in combinations(range(CARDS_PER_ROW), size):
+            index = subset_index(columns)
+            section_win += np.bincount(index, weights=win, minlength=SECTION_SIZES[size])
+            section_draw += np.bincount(index, weights=draw, minlength=SECTION_SIZES[size])
+        completions = BINOMIAL[DECK_SIZE - size][CARDS_PER_ROW - size]
+        section_win /= completions
+        section_draw /= completions
+
+        # Rounded so rows differing only by suit, summed in a different order, still tie
+        _, ranks, rank_counts = np.unique(np.round(section_win + section_draw / 2, 12), return_inverse=True, return_counts=True)
+        below = np.concatenate(([0], np.cumsum(rank_counts)[:-1]))[ranks]
+        sections.append(((below + rank_counts[ranks] / 2) / SECTION_SIZES[size], section_win, section_draw))
+
+    full_index = subset_index(range(CARDS_PER_ROW))
+    full_section = []
+    for values in (percentile, win, draw):
+        ordered = np.empty(hand_count)
+        ordered[full_index] = values
+        full_section.append(ordered)
+    sections.append(full_section)
+
+    # Written beside the table and renamed over it, so an interrupted build never leaves a truncated table
+    entries = np.concatenate([np.stack(section, axis=1) for section in sections])
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as table_file:
+            table_file.write(HEADER.pack(MAGIC, TABLE_ENTRIES))
+            table_file.write(np.round(entries * ODDS_SCALE).astype('<u2').tobytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Builds and queries the precomputed hand percentile and win chance table')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='work out every row and write the table file')
+    build_parser.add_argument('-o', '--output', default=TABLE_FILE)
+    lookup_parser = commands.add_parser('lookup', help='print the odds of a row, e.g. lookup AS KS 10h')
+    lookup_parser.add_argument('cards', nargs='*')
+    lookup_parser.add_argument('--table', default=TABLE_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        build_table(args.output)
+        print(f'{TABLE_ENTRIES} rows written to {args.output} ({os.path.getsize(args.output)} bytes) in {time.perf_counter() - start:.1f}s')
+        return
+
+    codes = [parse_card(card) for card in args.cards]
+    if len(set(codes)) != len(codes) or len(codes) > CARDS_PER_ROW:
+        parser.error(f'a row is up to {CARDS_PER_ROW} different cards')
+    odds = HandTable(args.table).lookup(codes)
+    print(f'percentile {odds.percentile:.2%}  win {odds.win:.2%}  draw {odds.draw:.2%}  loss {1 - odds.win - odds.draw:.2%}')
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,26 @@
 
 
 # LIBRARIES
-import random
 from collections import namedtuple, Counter
+import argparse
+import hashlib
+import io
 import pygame
 import os
 import sys
+import threading
 import time
+from animation import Animator, approach, ease_out_back
+from engine import DECK_SIZE, ROWS, Game, card_name, card_value
+from equity import EquityEstimator
+from hand_eval import hand_category, hand_name
+from hand_table import load_table
+from profiler import FrameProfiler, no_phase
+from protocol import DRAWN, END, HIDDEN, JOIN, LEFT, PLACE, PLACED, START, YOU, MatchClient
+from records import RecordWriter, record_game
+from turns import TurnScheduler
+from render_cache import card_shadow, quantize_scale, render_text, scaled_image
+from renderer import DirtyRenderer
 
 
 # CONFIG
@@ -33,14 +47,24 @@ CROP_WIDTH = 142
 CROP_HEIGHT = 190
 CARD_WIDTH = CROP_WIDTH * UI_SCALING
 CARD_HEIGHT = CROP_HEIGHT * UI_SCALING
-ROWS = 5
 CARD_SPACING_X = 210 * UI_SCALING
 CARD_SPACING_Y = 50 * UI_SCALING 
 MENU_WIDTH = 250 * UI_SCALING
 WINDOW_SCALING = 0.90  
-CARDS_PER_ROW = 5
-SUIT_ORDER = {'Hearts': 1, 'Diamonds': 2, 'Clubs': 3, 'Spades':4}
-RANK_ORDER = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14}
+AI_DIFFICULTY = 'medium' # One of policies.DIFFICULTIES
+AI_WORKER = 'thread' # Where opponent moves are worked out, 'thread' or 'process'
+IDLE_AFTER = 0.5 # Seconds without input or screen changes before the loop sleeps until the next event
+IDLE_WAIT_MS = 1000
+FACE_CACHE_DIR = '.cache' # Baked card faces are kept here keyed on a hash of card_designs.png, None to disable
+PROFILER_KEY = pygame.K_F3 # Toggles the frame profiler HUD
+RECORD_FILE = 'game_records.bin' # Every game played is appended here as a compact record, None to disable
+HAND_TABLE_FILE = 'hand_table.bin' # Built with python hand_table.py build, the side panel shows each row's odds from it when present
+UPDATE_STEP = 1 / 120 # Animations advance in fixed steps of this many seconds, whatever the frame rate
+MAX_FRAME_TIME = 0.25 # Longer gaps (such as idling) are only caught up by this much
+HOVER_RATE = 9.75 # Hover easing per second, the old 0.15 per frame at 60 FPS
+DROP_TIME = 0.18
+DEAL_TIME = 0.3
+DEAL_STAGGER = 0.04
 PLAYER_SHADOW_OFFSETS = {
     0: (-15, 5),
     1: (-7, 7),
@@ -58,72 +82,94 @@ OPPONENT_SHADOW_OFFSETS = {
 
 
 # CLASSES
+Layout = namedtuple('Layout', ['draw_area_x', 'draw_area_y', 'row_area_x', 'row_area_y'])
+
+
 class Card:
-    def __init__(self, rank, suit, image, card_back):
-        self.rank = rank
-        self.suit = suit
+    __slots__ = ('code', 'rank', 'suit', 'image', 'card_back', 'rect', 'hovered_scale', 'current_scale', 'target_scale', 'bounce', 'offset')
+
+    def __init__(self, code, image, card_back):
+        self.code = code
+        self.rank, self.suit = card_name(code)
         self.image = image
         self.card_back = card_back
         self.rect = pygame.Rect(0, 0, (CARD_WIDTH * UI_SCALING), (CARD_HEIGHT * UI_SCALING))
         self.hovered_scale = 1 
         self.current_scale = 1
+        self.target_scale = 1
+        self.bounce = 1 # Scale multiplier tweened when the card lands
+        self.offset = (0, 0) # Distance from where the card belongs, tweened to (0, 0) as it flies into place
 
-    def draw(self, screen, x, y, rotate=False, shadow=False, shadow_offset=(5, 5), hidden=False, is_player=True):
-        """ Draws the card on the screen, rotating it if indicated, and adding some shadow """
+    def update(self, dt, is_player=True):
+        """ Eases the card towards its hover scale, called every update step """
         mouse_x, mouse_y = pygame.mouse.get_pos()
         hovered = self.rect.collidepoint(mouse_x, mouse_y) if is_player else False
 
         self.target_scale = 1.05 if hovered else 1.0
-        self.current_scale += (self.target_scale - self.current_scale) * 0.15
-        
-        card_width = int(CARD_WIDTH * self.current_scale)
-        card_height = int(CARD_HEIGHT * self.current_scale)
+        self.current_scale = approach(self.current_scale, self.target_scale, HOVER_RATE, dt)
+
+    def display_scale(self):
+        return quantize_scale(self.current_scale * self.bounce)
+
+    def bounds(self, x, y, shadow=False, shadow_offset=(5, 5)):
+        """ Returns the screen area the card covers when drawn at x, y, including its shadow """
+        x, y = x + round(self.offset[0]), y + round(self.offset[1])
+        scale = self.display_scale()
+        card_width = int(CARD_WIDTH * scale)
+        card_height = int(CARD_HEIGHT * scale)
+        rect = pygame.Rect(x - (card_width - CARD_WIDTH) // 2, y - (card_height - CARD_HEIGHT) // 2, card_width, card_height)
+        if shadow:
+            rect.union_ip(pygame.Rect(x + shadow_offset[0], y + shadow_offset[1], CARD_WIDTH, CARD_HEIGHT))
+        return rect
+
+    def draw(self, screen, x, y, rotate=False, shadow=False, shadow_offset=(5, 5), hidden=False):
+        """ Draws the card on the screen, rotating it if indicated, and adding some shadow """
+        x, y = x + round(self.offset[0]), y + round(self.offset[1])
+        scale = self.display_scale()
+        card_width = int(CARD_WIDTH * scale)
+        card_height = int(CARD_HEIGHT * scale)
 
         if shadow:
-            shadow_surface = pygame.Surface(((CARD_WIDTH), (CARD_HEIGHT)), pygame.SRCALPHA)
-            pygame.draw.rect(shadow_surface, (0, 0, 0, 80), (0, 0, (CARD_WIDTH), (CARD_HEIGHT)), border_radius=10)
-            screen.blit(shadow_surface, (x + shadow_offset[0], y + shadow_offset[1]))
+            screen.blit(card_shadow((CARD_WIDTH, CARD_HEIGHT)), (x + shadow_offset[0], y + shadow_offset[1]))
 
         card_image = self.card_back if hidden else self.image
-        card_image = pygame.transform.scale(card_image, (card_width, card_height))
-
-        if rotate:
-            card_image = pygame.transform.rotate(card_image, 180)
+        card_image = scaled_image(card_image, (card_width, card_height), rotate, hidden)
 
         screen.blit(card_image, (x - (card_width - CARD_WIDTH) // 2, y - (card_height - CARD_HEIGHT) // 2))
         self.rect.topleft = (x, y)
         self.rect.size = (card_width, card_height)
 
 
-class Deck:
-    def __init__(self, sprite_sheet, card_back):
-        self.cards = self.create_deck(sprite_sheet, card_back)
-        random.shuffle(self.cards)
-        self.card_back = card_back
+class FaceAtlas:
+    """ Every rounded card face baked once into a single surface laid out like the sprite sheet, cards only hold subsurfaces of it """
+    def __init__(self, surface):
+        self.surface = surface
+        self.faces = tuple(surface.subsurface(face_crop(code)) for code in range(52))
 
-    def create_deck(self, sprite_sheet, card_back):
-        cards = []
-        suits = ['Hearts', 'Clubs', 'Diamonds', 'Spades']
-        ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+    @classmethod
+    def bake(cls, sprite_sheet):
+        surface = pygame.Surface((13 * CROP_WIDTH, 4 * CROP_HEIGHT), pygame.SRCALPHA)
+        for code in range(52):
+            card_crop = face_crop(code)
+            card_surface = surface.subsurface(card_crop)
+            pygame.draw.rect(card_surface, (255, 255, 255), (0, 0, (CROP_WIDTH), (CROP_HEIGHT)), border_radius=10)
+            card_surface.blit(sprite_sheet.subsurface(card_crop), (0, 0))
+        return cls(surface)
 
-        for row, suit in enumerate(suits):
-            for col, rank in enumerate(ranks):
-                card_surface = pygame.Surface(((CROP_WIDTH), (CROP_HEIGHT)), pygame. SRCALPHA)
-                pygame.draw.rect(card_surface, (255, 255, 255), (0, 0, (CROP_WIDTH), (CROP_HEIGHT)), border_radius=10)
-                card_crop = pygame.Rect(col * CROP_WIDTH, row * CROP_HEIGHT, CROP_WIDTH, CROP_HEIGHT)
-                card_image = sprite_sheet.subsurface(card_crop)
-                card_surface.blit(card_image, (0, 0))
-                cards.append(Card(rank, suit, card_surface, card_back))
+    def face(self, code):
+        return self.faces[code]
 
-        return cards
 
-    def deal_card(self):
-        return self.cards.pop() if self.cards else None
+class DeckView:
+    """ The card sprites for every card code, the rules engine only ever holds the codes """
+    def __init__(self, atlas, card_back):
+        self.cards = [Card(code, atlas.face(code), card_back) for code in range(52)]
+        self.card_back = card_back
 
-    def draw_stack(self, screen, x, y):
+    def draw_stack(self, screen, x, y, count):
         """ Draws the deck stack with a decreasing effect """
-        for i in range(min(len(self.cards), 2)):
-            back_image = pygame.transform.scale(self.card_back, (CARD_WIDTH, CARD_HEIGHT))
+        for i in range(min(count, 2)):
+            back_image = scaled_image(self.card_back, (CARD_WIDTH, CARD_HEIGHT), hidden=True)
             screen.blit(back_image, (x -  i * 5, y - i * 5))
 
 
@@ -140,8 +186,7 @@ class Button:
     def button_draw(self, screen):
         pygame.draw.rect(screen, self.outline_color, self.back_rect, border_radius=10)
         pygame.draw.rect(screen, self.color, self.rect, border_radius=10)
-        self.font = pygame.font.Font(CONFIG['font'], int(self.rect.height * 0.5))
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(CONFIG['font'], int(self.rect.height * 0.5), self.text, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
@@ -150,29 +195,159 @@ class Button:
             self.action()
 
 
-class GameState:
-    def __init__(self, sprite_sheet, card_back):
-        self.sprite_sheet = sprite_sheet
+class GameState(Game):
+    """ Pygame view over the headless Game, mapping card codes to their sprites. Games are written to archive
+        when they finish, or when they are shuffled away or the window closes part way through """
+    def __init__(self, atlas, card_back, archive=None, hand_table=None):
+        super().__init__()
+        self.atlas = atlas
         self.card_back = card_back
-        self.deck = Deck(self.sprite_sheet, self.card_back)
-        self.player_hand = [] 
-        self.opponent_hand = []
-        self.player_turn = True 
-        self.drawn_card = None
-
-    def draw_card(self):
-        if self.player_turn == True and self.deck.cards:
-            self.drawn_card = self.deck.deal_card()
-        elif self.player_turn == False and self.deck.cards:
-            self.drawn_card = self.deck.deal_card()
+        self.deck_view = DeckView(self.atlas, self.card_back)
+        self.summary_version = None
+        self.summaries = []
+        self.archive = archive
+        self.archived = True
+        self.hand_table = hand_table
+        self.odds_version = None
+        self.odds = None
+        self.animator = Animator()
+        self.row_flames = [None] * ROWS
+        self.flames_version = None
 
     def shuffle_deck(self):
-        self.deck = Deck(self.sprite_sheet, self.card_back)
-        random.shuffle(self.deck.cards) 
-        self.player_hand = [[self.deck.deal_card()] for _ in range(ROWS)]
-        self.opponent_hand = [[self.deck.deal_card()] for _ in range(ROWS)]
-        self.drawn_card = None
-        self.player_turn = True
+        self.archive_game()
+        super().shuffle_deck()
+        self.archived = False
+
+    def archive_game(self):
+        if self.archive and not self.archived:
+            self.archive.write(record_game(self))
+            self.archived = True
+
+    def join_match(self, player_first, player_cards, opponent_cards):
+        """ Starts a networked game from the first card of each row the server dealt. The deck only stands for the
+            cards not seen yet, and the game is not archived here since the server holds the real deal """
+        self.archive_game()
+        dealt = [*player_cards, *opponent_cards]
+        self.deck.cards[:] = [code for code in range(DECK_SIZE) if code not in dealt] + dealt[::-1]
+        self.deal_hands()
+        self.player_turn = player_first
+
+    def card(self, code):
+        return self.deck_view.cards[code]
+
+    def row_summaries(self):
+        """ The side panel text for every row, only worked out again after a card is placed """
+        if self.summary_version != self.version:
+            self.summaries = [summarize_row(*rows) for rows in zip(self.player_hand, self.opponent_hand, self.player_strengths, self.opponent_strengths)]
+            self.summary_version = self.version
+        return self.summaries
+
+    def row_odds(self):
+        """ The precomputed RowOdds of each of the player's rows, None without a hand table """
+        if self.hand_table and self.odds_version != self.version:
+            self.odds = [self.hand_table.lookup(row) for row in self.player_hand]
+            self.odds_version = self.version
+        return self.odds if self.hand_table else None
+
+    def sync_row_flames(self):
+        """ Keeps one RowFlames per row that someone is winning, so they carry on growing across frames """
+        if self.flames_version == self.version:
+            return
+        self.flames_version = self.version
+        summaries = self.row_summaries() if self.player_hand else [(None, None, False, False)] * ROWS
+        for i, (_, _, player_winning, opponent_winning) in enumerate(summaries):
+            direction = 'left' if player_winning else 'right' if opponent_winning else None
+            flames = self.row_flames[i]
+            if direction is None:
+                self.row_flames[i] = None
+            elif flames is None or flames.direction != direction:
+                _, row_content_rect = menu_row_rects(i)
+                x = row_content_rect.left if direction == 'left' else row_content_rect.right
+                self.row_flames[i] = RowFlames(x, row_content_rect.centery, direction)
+
+    def update(self, dt):
+        """ One fixed update step of every animation """
+        for row in self.player_hand:
+            for code in row:
+                self.card(code).update(dt)
+        for row in self.opponent_hand:
+            for code in row:
+                self.card(code).update(dt, is_player=False)
+        if self.drawn_card is not None:
+            self.card(self.drawn_card).update(dt)
+        for flames in self.row_flames:
+            if flames:
+                flames.update(dt)
+        self.animator.update(dt)
+
+    def animating(self):
+        return self.animator.active or any(flames and flames.growing for flames in self.row_flames)
+
+
+class RemoteOpponent:
+    """ Takes the place of the local AI when playing over the network. The server deals, draws for whoever is to
+        move and checks every placement, its messages are mirrored into the GameState. The player's placements are
+        made locally straight away and sent on, the server applies the same rules so it will agree with them """
+    def __init__(self, client):
+        self.client = client
+        self.in_match = False
+        self.status = None
+        self.join()
+
+    @property
+    def active(self):
+        """ True while messages are expected, so the main loop should keep polling rather than idle """
+        return not self.client.closed and (self.in_match or self.status is not None)
+
+    def join(self):
+        """ Looks for a match, unless one is being played """
+        if not self.in_match and not self.client.closed:
+            self.client.send(JOIN)
+            self.status = 'Finding an opponent...'
+
+    def place(self, row_index):
+        self.client.send(PLACE, row_index)
+
+    def poll(self, game_state, layout):
+        """ Applies the messages that have arrived. Returns the code of a card the opponent placed this frame,
+            HIDDEN while they hold a drawn card or None, the same as ai_card for the local AI """
+        opponent_card = None
+        for kind, payload in self.client.poll():
+            if kind == START:
+                game_state.join_match(payload[0] == YOU, payload[1:1 + ROWS], payload[1 + ROWS:])
+                deal_cards(game_state, layout)
+                self.in_match = True
+                self.status = None
+            elif kind == DRAWN and payload[0] == YOU:
+                game_state.player_turn = True
+                game_state.deck.cards.remove(payload[1])
+                game_state.drawn_card = payload[1]
+                draw_from_deck(game_state, layout)
+            elif kind == DRAWN:
+                game_state.player_turn = False
+            elif kind == PLACED and payload[0] != YOU:
+                _, row_index, code = payload
+                game_state.deck.cards.remove(code)
+                game_state.drawn_card = code
+                game_state.place_card(row_index)
+                slot = card_slot(layout.row_area_x, layout.row_area_y['opponent'], row_index, len(game_state.opponent_hand[row_index]) - 1, is_opponent=True)
+                bounce_card(game_state.animator, game_state.card(code), (layout.draw_area_x, layout.draw_area_y['opponent'] + 5), slot)
+                opponent_card = code
+            elif kind == END:
+                self.in_match = False
+            elif kind == LEFT:
+                self.in_match = False
+                self.status = 'Match called off'
+        if self.client.closed:
+            self.in_match = False
+            self.status = 'Disconnected'
+        if opponent_card is None and self.in_match and not game_state.player_turn:
+            opponent_card = HIDDEN
+        return opponent_card
+
+    def close(self):
+        self.client.close()
 
 
 class RowFlames:
@@ -183,133 +358,197 @@ class RowFlames:
         self.direction = direction
         self.width = 0
         self.max_width = 50
-        self.growth_speed = 5
+        self.growth_speed = 300 # Pixels per second
         self.flame_color = CONFIG['orange'] 
 
-    def update(self):
-        if self.width < self.max_width:
-            self.width += self.growth_speed
+    @property
+    def growing(self):
+        return self.width < self.max_width
+
+    def update(self, dt):
+        if self.growing:
+            self.width = min(self.max_width, self.width + self.growth_speed * dt)
 
     def draw(self, screen, row_content_rect):
+        width = int(self.width)
         if self.direction == "left":
-            flame_rect = pygame.Rect(row_content_rect.left, row_content_rect.top, self.width, row_content_rect.height)
+            flame_rect = pygame.Rect(row_content_rect.left, row_content_rect.top, width, row_content_rect.height)
         else:
-            flame_rect = pygame.Rect(row_content_rect.right - self.width, row_content_rect.top, self.width, row_content_rect.height)
+            flame_rect = pygame.Rect(row_content_rect.right - width, row_content_rect.top, width, row_content_rect.height)
 
         pygame.draw.rect(screen, self.flame_color, flame_rect, border_radius=10)
 
 
+class AssetLoader:
+    """ Reads and decodes the table texture, card faces and card back on a background thread, pygame lets go of
+        the GIL while it decodes and scales so the window keeps responding. Converting to the display's format and
+        baking the faces need the display, finish() does those on the main thread once ready is set """
+    def __init__(self, SCREEN_WIDTH, SCREEN_HEIGHT, cache_dir=FACE_CACHE_DIR):
+        self.ready = threading.Event()
+        self.decoded = None
+        self.error = None
+        threading.Thread(target=self.decode, args=(SCREEN_WIDTH, SCREEN_HEIGHT, cache_dir), daemon=True).start()
+
+    def decode(self, SCREEN_WIDTH, SCREEN_HEIGHT, cache_dir):
+        try:
+            self.decoded = (decode_background(SCREEN_WIDTH, SCREEN_HEIGHT), decode_faces(cache_dir), pygame.image.load(os.path.join('assets', 'card_back.png')))
+        except (OSError, pygame.error) as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def finish(self):
+        """ Waits for the decoding, returns (background_texture, face_atlas, card_back) ready to draw """
+        self.ready.wait()
+        if self.error:
+            print(f'Error loading assets: {self.error}')
+            sys.exit(1)
+        background_texture, faces, card_back = self.decoded
+        return background_texture.convert() if background_texture else None, finish_faces(*faces), card_back.convert_alpha()
+
+
 # FUNCTIONS           
-def load_background(SCREEN_WIDTH, SCREEN_HEIGHT):
-    """ Attempts to load the background texture for the table """
+def decode_background(SCREEN_WIDTH, SCREEN_HEIGHT):
+    """ Reads and scales the table texture without touching the display, None if it fails to load """
     try:
-        texture = pygame.image.load(os.path.join("assets", "table_texture.png")).convert()
+        texture = pygame.image.load(os.path.join("assets", "table_texture.png"))
         return pygame.transform.scale(texture, (SCREEN_WIDTH, SCREEN_HEIGHT))
     except:
         return None # Fallback if background texture fails to load
 
 
-def load_assets():
-    """ Load all game assets """
+def load_background(SCREEN_WIDTH, SCREEN_HEIGHT):
+    """ Attempts to load the background texture for the table """
+    texture = decode_background(SCREEN_WIDTH, SCREEN_HEIGHT)
+    return texture.convert() if texture else None
+
+
+def decode_faces(cache_dir=FACE_CACHE_DIR):
+    """ Reads the card faces without touching the display, returns (surface, baked, cache_path). surface is the
+        cached baked atlas when there is one, otherwise the decoded sprite sheet """
+    path = os.path.join("assets", "card_designs.png")
+    size = (13 * CROP_WIDTH, 4 * CROP_HEIGHT)
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    # Already cropped faces are stored as raw RGBA so a cache hit skips the PNG decode and the baking
+    cache_path = None
+    if cache_dir:
+        digest = hashlib.sha1(data).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f'faces-{digest}-{size[0]}x{size[1]}.rgba')
+        try:
+            with open(cache_path, 'rb') as file:
+                return pygame.image.frombytes(file.read(), size, 'RGBA'), True, cache_path
+        except (OSError, ValueError, pygame.error):
+            pass
+    return pygame.image.load(io.BytesIO(data), path), False, cache_path
+
+
+def finish_faces(surface, baked, cache_path):
+    """ Converts decode_faces' surface for the display, baking and caching the faces if it is the sprite sheet """
+    if baked:
+        return FaceAtlas(surface.convert_alpha())
+    atlas = FaceAtlas.bake(surface.convert_alpha())
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'wb') as file:
+                file.write(pygame.image.tobytes(atlas.surface, 'RGBA'))
+        except OSError:
+            pass
+    return atlas
+
+
+def load_assets(cache_dir=FACE_CACHE_DIR):
+    """ Load all game assets, returning the baked card face atlas """
     try:
-        return pygame.image.load(os.path.join("assets", "card_designs.png")).convert_alpha()
-    except pygame.error as e:
+        return finish_faces(*decode_faces(cache_dir))
+    except (OSError, pygame.error) as e:
         print(f'Error loading sprite sheet: {e}')
         sys.exit(1)
-        
 
-def draw_hand(screen, hand, row_x, row_y, shadow_offsets, is_opponent=False):
+
+def face_crop(code):
+    """ Returns where a card code's face sits on the sprite sheet """
+    row, col = divmod(code, 13)
+    return pygame.Rect(col * CROP_WIDTH, row * CROP_HEIGHT, CROP_WIDTH, CROP_HEIGHT)
+
+
+def build_background(SCREEN_WIDTH, SCREEN_HEIGHT, background_texture, layout):
+    """ Composes the table, menu panel and card area shadows once into a single surface """
+    DRAW_AREA_X, DRAW_AREA_Y = layout.draw_area_x, layout.draw_area_y
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    background.fill(CONFIG['green'])
+    if background_texture:
+        background.blit(background_texture, (0,0))
+
+    # Menu and button overlays 
+    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    pygame.draw.rect(overlay, CONFIG['menu-bg'], (60, 0, MENU_WIDTH, SCREEN_HEIGHT))
+    pygame.draw.rect(overlay, CONFIG['button-bg'], (59, -3, MENU_WIDTH + 2, SCREEN_HEIGHT + 6), width=2) # Menu outline
+
+    # Card area/shadow overlays
+    pygame.draw.rect(overlay, CONFIG['grey_transparent'], (DRAW_AREA_X, DRAW_AREA_Y['player'], ((CARD_WIDTH * UI_SCALING) * UI_SCALING) + 10, (CARD_HEIGHT * UI_SCALING)), border_radius=10)
+    pygame.draw.rect(overlay, CONFIG['grey_transparent'], (DRAW_AREA_X, DRAW_AREA_Y['opponent'], (CARD_WIDTH * UI_SCALING) + 10, (CARD_HEIGHT * UI_SCALING) + 10), border_radius=10)
+    pygame.draw.rect(overlay, CONFIG['grey_transparent'], (DRAW_AREA_X, DRAW_AREA_Y['deck'] + 5, (CARD_WIDTH * UI_SCALING) + 5, (CARD_HEIGHT * UI_SCALING) - 5), border_radius=10)
+    background.blit(overlay, (0,0))
+    return background
+
+
+def board_layout(SCREEN_WIDTH, SCREEN_HEIGHT):
+    """ Returns where the draw areas and rows sit for a window size """
+    return Layout(
+        draw_area_x=SCREEN_WIDTH - 250,
+        draw_area_y={'player': SCREEN_HEIGHT - 290, 'opponent': 100, 'deck': SCREEN_HEIGHT / 2 - 95},
+        row_area_x=MENU_WIDTH + 60 + 75,
+        row_area_y={'player': SCREEN_HEIGHT / 2 + 50, 'opponent': SCREEN_HEIGHT / 2 - 240}
+    )
+
+
+def card_slot(row_x, row_y, row_index, col_index, is_opponent=False):
+    """ Where the card at row_index, col_index of a hand is drawn """
+    return row_x + (row_index * CARD_SPACING_X), row_y + (col_index * CARD_SPACING_Y) * (-1 if is_opponent else 1)
+
+
+def hand_positions(hand, row_x, row_y, is_opponent=False):
+    """ Yields (row_index, code, x, y) for every card of a hand in drawing order """
     for row_index, row in enumerate(hand):
-        for col_index, card in enumerate(row):
-            card_x = row_x + (row_index * CARD_SPACING_X)
-            card_y = row_y + (col_index * CARD_SPACING_Y) * (-1 if is_opponent else 1)
-            card.draw(screen, card_x, card_y, shadow=True, shadow_offset=shadow_offsets[row_index], is_player=False if is_opponent else True)
+        for col_index, code in enumerate(row):
+            yield row_index, code, *card_slot(row_x, row_y, row_index, col_index, is_opponent)
+
+
+def draw_hand(screen, game_state, hand, row_x, row_y, shadow_offsets, is_opponent=False):
+    for row_index, code, card_x, card_y in hand_positions(hand, row_x, row_y, is_opponent):
+        game_state.card(code).draw(screen, card_x, card_y, shadow=True, shadow_offset=shadow_offsets[row_index])
 
 
 def draw_deck_counter(screen, count, x, y):
     """ Draws the deck counter near the deck area """
-    font = pygame.font.Font(CONFIG['font'], 25)
-    text_surface = font.render(f"{count}/52", True, CONFIG['white'])
+    text_surface = render_text(CONFIG['font'], 25, f"{count}/52", CONFIG['white'])
     screen.blit(text_surface, (x, y))
 
 
-def bounce_card(card):
-    original_size = card.image.get_size()
-    enlarged_size = (int(original_size[0] * 1.1), int(original_size[1] * 1.1))
-
-    card.image = pygame.transform.scale(card.image, enlarged_size)
-    time.sleep(0.05)
-
-    card.image = pygame.transform.scale(card.image, original_size) 
-
-
-def min_cards_in_row(rows):
-    """ Returns the current minimum number of cards in the rows """
-    return min(len(row) for row in rows)
-
-
-def validate_row(row, rows):
-    """ Checks if a card can be placed in the chosen row, using the minimum number of cards """
-    return len(row) == min_cards_in_row(rows) and len(row) < CARDS_PER_ROW
-
-
-def rank_hand(hand):
-    """ Evaluates a poker hand assigns a numberic value for comparison """
-    ranks = sorted([RANK_ORDER[card.rank] for card in hand], reverse=True)
-    suits = [card.suit for card in hand]
-    rank_counts = Counter(ranks)
-    rank_frequencies = sorted(rank_counts.values(), reverse=True)
-
-    is_flush = len(set(suits)) == 1 and len(hand) == 5
-    is_straight = ranks == list(range(ranks[0], ranks[0] - 5, -1))
-
-    if is_flush and is_straight and ranks[0] == 14: 
-        return [10, ranks, 'Royal Flush']
-    elif is_flush and is_straight:
-        return [9, ranks, 'Straight Flush']
-    elif max(rank_frequencies) == 4:
-        return [8, ranks, 'Four of a Kind']
-    elif rank_frequencies == [3, 2]:
-        return [7, ranks, 'Full House']
-    elif is_flush:
-        return [6, ranks, 'Flush']
-    elif is_straight:
-        return [5, ranks, 'Straight']
-    elif 3 in rank_frequencies:
-        return [4, ranks, 'Three of a Kind']
-    elif rank_frequencies.count(2) == 2:
-        return [3, ranks, 'Two Pair']
-    elif 2 in rank_frequencies:
-        return [2, ranks, 'Pair']
-    else: # High Card
-        return [1, ranks, 'High']
-
-
-def compare_rows(player_hand, opponent_hand):
-    """ Compares all rows and determines the overall winner """
-    player_wins = 0
-    opponent_wins = 0
-    row_wins = {}
-
-    for i in range(ROWS):
-        player_rank = rank_hand(player_hand[i])
-        opponent_rank = rank_hand(opponent_hand[i])
-
-        if player_rank > opponent_rank:
-            player_wins += 1
-            row_wins[i] = 'player'
-        elif opponent_rank > player_rank:
-            opponent_wins += 1
-            row_wins[i] = 'opponent'
-        else:
-            row_wins[i] = 'draw'
+def bounce_card(animator, card, start_position, end_position):
+    """ Flies a placed card from where it was let go into its slot and pops it slightly as it lands """
+    animator.tween(card, 'offset', (start_position[0] - end_position[0], start_position[1] - end_position[1]), (0, 0), DROP_TIME)
+    animator.tween(card, 'bounce', 1.1, 1.0, DROP_TIME * 1.5, ease=ease_out_back)
+
+
+def deal_cards(game_state, layout):
+    """ Flies the dealt cards out of the deck to their rows one after another """
+    deck_x, deck_y = layout.draw_area_x, layout.draw_area_y['deck'] - 2
+    for side, (hand, is_opponent) in enumerate([(game_state.player_hand, False), (game_state.opponent_hand, True)]):
+        row_y = layout.row_area_y['opponent' if is_opponent else 'player']
+        for row_index, code, card_x, card_y in hand_positions(hand, layout.row_area_x, row_y, is_opponent):
+            delay = (row_index * 2 + side) * DEAL_STAGGER
+            game_state.animator.tween(game_state.card(code), 'offset', (deck_x - card_x, deck_y - card_y), (0, 0), DEAL_TIME, delay=delay)
 
-    if player_wins > opponent_wins:
-        return ["Players Wins!", row_wins]
-    elif opponent_wins > player_wins:
-        return ["Opponent Wins!", row_wins]
-    else:
-        return ["It's a draw!", row_wins]
+
+def draw_from_deck(game_state, layout):
+    """ Slides the player's drawn card from the deck to the draw area """
+    if game_state.drawn_card is not None:
+        distance = layout.draw_area_y['deck'] - 2 - (layout.draw_area_y['player'] - 5)
+        game_state.animator.tween(game_state.card(game_state.drawn_card), 'offset', (0, distance), (0, 0), DROP_TIME)
 
 
 def get_max_card(hand_ranks, rank_frequencies, hand_rank):
@@ -332,107 +571,204 @@ def get_max_card(hand_ranks, rank_frequencies, hand_rank):
     return max_card 
 
 
-def menu_row_state(screen, SCREEN_WIDTH, SCREEN_HEIGHT, state=None, player_hand=None, opponent_hand=None):
-    """ Draws an overlay display on the menu area that gives the player information on how a row is doing """
-    if not player_hand:
-        return
+def summarize_row(player_row, opponent_row, player_rank, opponent_rank):
+    """ Works out the side panel text and who is ahead for one row """
+    player_ranks = [card_value(code) for code in player_row]
+    opponent_ranks = [card_value(code) for code in opponent_row]
+    player_category, opponent_category = hand_category(player_rank), hand_category(opponent_rank)
+    max_player = get_max_card(player_ranks, Counter(player_ranks), player_category)
+    max_opponent = get_max_card(opponent_ranks, Counter(opponent_ranks), opponent_category)
 
-    # Initialize fonts
-    header_font = pygame.font.Font(CONFIG['font'], 24) 
-    content_font_player = pygame.font.Font(CONFIG['font'], 22)
-    content_font_opponent = pygame.font.Font(CONFIG['font'], 18)
-    row_results = {}
+    display_player_card = {14: 'A', 13: 'K', 12: 'Q', 11: 'J'}.get(max_player, str(max_player))
+    display_opponent_card = {14: 'A', 13: 'K', 12: 'Q', 11: 'J'}.get(max_opponent, str(max_opponent))
 
-    # Array with items to be displayed
-    for i in range(ROWS):
-        if (tuple(player_hand[i]), tuple(opponent_hand[i])) not in row_results:
-            player_rank = rank_hand(player_hand[i])
-            opponent_rank = rank_hand(opponent_hand[i])
-            row_results[(tuple(player_hand[i]), tuple(opponent_hand[i]))] = (player_rank, opponent_rank)
+    if player_category == opponent_category:
+        if max_player > max_opponent:
+            player_winning, opponent_winning = True, False
+        elif max_opponent > max_player:
+            player_winning, opponent_winning = False, True
         else:
-            player_rank, opponent_rank = row_results[(tuple(player_hand[i]), tuple(opponent_hand[i]))]
+            player_winning, opponent_winning = False, False
+    else:
+        player_winning = player_category > opponent_category
+        opponent_winning = opponent_category > player_category
 
-        max_player = get_max_card(player_rank[1], Counter(player_rank[1]), player_rank[0])
-        max_opponent = get_max_card(opponent_rank[1], Counter(opponent_rank[1]), opponent_rank[0])
+    player_text = f'{hand_name(player_rank)} {display_player_card}'
+    opponent_text = f'{hand_name(opponent_rank)} {display_opponent_card}'
+    return player_text, opponent_text, player_winning, opponent_winning
 
-        display_player_card = {14: 'A', 13: 'K', 12: 'Q', 11: 'J'}.get(max_player, str(max_player))
-        display_opponent_card = {14: 'A', 13: 'K', 12: 'Q', 11: 'J'}.get(max_opponent, str(max_opponent))
 
-        if player_rank[0] == opponent_rank[0]:
-            if max_player > max_opponent:
-                player_winning, opponent_winning = True, False
-            elif max_opponent > max_player:
-                player_winning, opponent_winning = False, True
-            else:
-                player_winning, opponent_winning = False, False
-        else:
-            player_winning = player_rank[0] > opponent_rank[0]
-            opponent_winning = opponent_rank[0] > player_rank[0]
+def menu_row_rects(row_index):
+    """ The outer panel and the inner content area of a row in the side menu """
+    menu_display_rect = pygame.Rect(65, 100 + (row_index * 120), MENU_WIDTH - 10, 110)
+    row_content_rect = pygame.Rect(
+            menu_display_rect.left + 5,
+            menu_display_rect.top + 40,
+            menu_display_rect.width - 10,
+            60
+    )
+    return menu_display_rect, row_content_rect
 
-        # Outer Rectangle
-        menu_display_rect = pygame.Rect(65, 100 + (i * 120), MENU_WIDTH - 10, 110)
-        pygame.draw.rect(screen, CONFIG['button-dark'], menu_display_rect, border_radius=10)
 
-        # Row content rectangle
-        row_content_rect = pygame.Rect(
-                menu_display_rect.left + 5,
-                menu_display_rect.top + 40,
-                menu_display_rect.width - 10,
-                60
-        )
-        pygame.draw.rect(screen, CONFIG['menu-bg'], row_content_rect, border_radius=10)
+def menu_row_state(screen, SCREEN_WIDTH, SCREEN_HEIGHT, game_state=None, equity=None):
+    """ Draws an overlay display on the menu area that gives the player information on how a row is doing """
+    if not game_state or not game_state.player_hand:
+        return
 
-        # Flame particles
-        if player_winning:
-            row_flames = RowFlames(row_content_rect.left, row_content_rect.centery, 'left')
-        elif opponent_winning:
-            row_flames = RowFlames(row_content_rect.right, row_content_rect.centery, 'right')
-        else:
-            row_flames = None
+    # Estimated chance of winning the match, labelled apart once it is the solver's value for both sides playing
+    # their best, since the row chances stay random play estimates
+    if equity and equity.match_win_rate() is not None:
+        label = 'Best play' if equity.match_is_exact() else 'Win chance'
+        match_surface = render_text(CONFIG['font'], 24, f'{label} {equity.match_win_rate():.0%}', CONFIG['white'])
+        screen.blit(match_surface, (75, 60))
+
+    # Array with items to be displayed
+    row_odds = game_state.row_odds()
+    for i, (player_text, opponent_text, player_winning, opponent_winning) in enumerate(game_state.row_summaries()):
+        # Outer Rectangle and row content rectangle
+        menu_display_rect, row_content_rect = menu_row_rects(i)
+        pygame.draw.rect(screen, CONFIG['button-dark'], menu_display_rect, border_radius=10)
+        pygame.draw.rect(screen, CONFIG['menu-bg'], row_content_rect, border_radius=10)
 
+        # Flame particles, grown by GameState.update
+        row_flames = game_state.row_flames[i]
         if row_flames:
-            row_flames.update()
             row_flames.draw(screen, row_content_rect)
 
         # Render header
-        header_surface = header_font.render(f'Row {i + 1}', True, CONFIG['white'])
+        header_surface = render_text(CONFIG['font'], 24, f'Row {i + 1}', CONFIG['white'])
         screen.blit(header_surface, (MENU_WIDTH / 2 + 30, menu_display_rect.top + 10))
 
+        # Render the row's chance of beating a random finished row, from the hand table
+        if row_odds:
+            odds_surface = render_text(CONFIG['font'], 16, f'Beats {row_odds[i].win:.0%}', CONFIG['white'])
+            screen.blit(odds_surface, odds_surface.get_rect(right=menu_display_rect.right - 10, top=menu_display_rect.top + 14))
+
+        # Render estimated chance of winning the row
+        if equity and equity.row_win_rate(i) is not None:
+            equity_surface = render_text(CONFIG['font'], 24, f'{equity.row_win_rate(i):.0%}', CONFIG['white'])
+            screen.blit(equity_surface, (menu_display_rect.left + 10, menu_display_rect.top + 10))
+
         # Render player & opponent rankings
-        player_text = f'{player_rank[2]} {display_player_card}'
-        opponent_text = f'{opponent_rank[2]} {display_opponent_card}'
-        
-        player_surface = content_font_player.render(player_text, True, CONFIG['white'])
-        opponent_surface = content_font_opponent.render(opponent_text, True, CONFIG['white'])
+        player_surface = render_text(CONFIG['font'], 22, player_text, CONFIG['white'])
+        opponent_surface = render_text(CONFIG['font'], 18, opponent_text, CONFIG['white'])
         opponent_rect = opponent_surface.get_rect(right=row_content_rect.right - 10, bottom=row_content_rect.bottom - 10)
 
         screen.blit(player_surface, (row_content_rect.left + 10, row_content_rect.top + 10))
         screen.blit(opponent_surface, opponent_rect)
 
 
-def check_game_end(player_hand, opponent_hand):
-    """ Checks if all rows are full and determines the winner """
-    if all(len(row) == CARDS_PER_ROW for row in player_hand) and all(len(row) == CARDS_PER_ROW for row in opponent_hand) and player_hand and opponent_hand:
-        return compare_rows(player_hand, opponent_hand)
-    return None
-
-
 def show_winner_message(screen, result, SCREEN_WIDTH, SCREEN_HEIGHT):
     """ Displays a semi-transparent winner message overly """
-    font = pygame.font.Font(CONFIG['font'], 72)
-    text = f'{result}'
-
-    text_surface = font.render(result, True, CONFIG['white'])
+    text_surface = render_text(CONFIG['font'], 72, result, CONFIG['white'])
     text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
     
     screen.blit(text_surface, text_rect)
 
 
+def make_buttons(SCREEN_HEIGHT, shuffle=None, draw=None):
+    """ The Shuffle and Draw buttons of the side menu, offscreen renders leave their actions as None """
+    return [
+        Button(65, SCREEN_HEIGHT - 265, MENU_WIDTH - 10, 75, 'Shuffle', CONFIG['button-bg'], CONFIG['button-dark'], CONFIG['white'], shuffle),
+        Button(65, SCREEN_HEIGHT - 175, MENU_WIDTH - 10, 75, 'Draw', CONFIG['button-bg'], CONFIG['button-dark'], CONFIG['white'], draw)
+    ]
+
+
 def draw_ui(screen, button):
     button.button_draw(screen)
 
+
+def draw_thinking(screen, dots, x, y):
+    """ Shows the opponent is still deciding where to place its card """
+    text_surface = render_text(CONFIG['font'], 25, 'Thinking' + '.' * dots, CONFIG['white'])
+    screen.blit(text_surface, (x, y))
+
+
+def scene_regions(game_state, layout, drawn_position, ai_card, equity, result, SCREEN_WIDTH, SCREEN_HEIGHT, thinking=None):
+    """ Describes everything that can change on screen as {key: (rect, signature)} for the dirty rectangle renderer """
+    DRAW_AREA_X, DRAW_AREA_Y = layout.draw_area_x, layout.draw_area_y
+    regions = {}
+
+    for hand, shadow_offsets, is_opponent in [(game_state.player_hand, PLAYER_SHADOW_OFFSETS, False), (game_state.opponent_hand, OPPONENT_SHADOW_OFFSETS, True)]:
+        row_y = layout.row_area_y['opponent' if is_opponent else 'player']
+        for row_index, code, card_x, card_y in hand_positions(hand, layout.row_area_x, row_y, is_opponent):
+            card = game_state.card(code)
+            regions[('card', code)] = (card.bounds(card_x, card_y, True, shadow_offsets[row_index]), card.display_scale())
+
+    # The opponent's drawn card stays hidden while it decides
+    if game_state.player_turn and game_state.drawn_card is not None:
+        card = game_state.card(game_state.drawn_card)
+        regions[('card', game_state.drawn_card)] = (card.bounds(*drawn_position), card.display_scale())
+
+    if ai_card is not None:
+        regions['ai_card'] = (pygame.Rect(DRAW_AREA_X, DRAW_AREA_Y['opponent'] + 5, CARD_WIDTH, CARD_HEIGHT), ai_card)
+
+    regions['deck'] = (pygame.Rect(DRAW_AREA_X - 5, DRAW_AREA_Y['deck'] - 7, CARD_WIDTH + 60, CARD_HEIGHT + 40), len(game_state.deck.cards))
+
+    if thinking is not None:
+        text_surface = render_text(CONFIG['font'], 25, 'Thinking' + '.' * thinking, CONFIG['white'])
+        regions['thinking'] = (text_surface.get_rect(topleft=(DRAW_AREA_X, DRAW_AREA_Y['opponent'] - 35)), thinking)
+
+    if game_state.player_hand:
+        equity_text = (equity.match_win_rate(), *(equity.row_win_rate(i) for i in range(ROWS))) if equity else ()
+        equity_text = tuple(None if rate is None else round(rate * 100) for rate in equity_text) + ((equity.match_is_exact(),) if equity else ())
+        flame_widths = tuple(int(flames.width) if flames else 0 for flames in game_state.row_flames)
+        regions['menu'] = (pygame.Rect(60, 55, MENU_WIDTH, 100 + (ROWS * 120) - 55), (game_state.version, equity_text, flame_widths))
+
+    if result:
+        text_surface = render_text(CONFIG['font'], 72, result[0], CONFIG['white'])
+        regions['winner'] = (text_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)), result[0])
+
+    return regions
+
+
+def draw_frame(screen, background, game_state, layout, buttons, drawn_position, ai_card, equity, result, SCREEN_WIDTH, SCREEN_HEIGHT, thinking=None, phase=no_phase):
+    """ Draws one full frame, the caller clips it to the dirty areas. thinking is the number of dots to show while
+        the opponent decides, phase times each step for the frame profiler """
+    DRAW_AREA_X, DRAW_AREA_Y = layout.draw_area_x, layout.draw_area_y
+    with phase('background'):
+        clip = screen.get_clip()
+        screen.blit(background, clip, clip)
+
+    # Deck Visual Creation
+    with phase('deck'):
+        game_state.deck_view.draw_stack(screen, DRAW_AREA_X, DRAW_AREA_Y['deck'] - 2, len(game_state.deck.cards))
+        draw_deck_counter(screen, len(game_state.deck.cards), DRAW_AREA_X + 100, DRAW_AREA_Y['deck'] + 195)
+
+    # Draw cards from the players initial hands
+    with phase('player_hand'):
+        draw_hand(screen, game_state, game_state.player_hand, layout.row_area_x, layout.row_area_y['player'], PLAYER_SHADOW_OFFSETS)
+    with phase('opponent_hand'):
+        draw_hand(screen, game_state, game_state.opponent_hand, layout.row_area_x, layout.row_area_y['opponent'], OPPONENT_SHADOW_OFFSETS, is_opponent=True)
+
+    # Draw Buttons
+    with phase('buttons'):
+        for i in range(len(buttons)):
+            draw_ui(screen, buttons[i])
+
+    # Draw row indicators on the board
+    if game_state.player_hand:
+        with phase('menu'):
+            menu_row_state(screen, SCREEN_WIDTH, SCREEN_HEIGHT, game_state, equity=equity)
+
+    # Draw player's initial card and the opponent's card as it is played
+    with phase('overlay'):
+        if game_state.player_turn and game_state.drawn_card is not None:
+            game_state.card(game_state.drawn_card).draw(screen, *drawn_position)
+        if ai_card is not None:
+            # Drawn as a plain card back, the card itself is already flying from here to its row
+            screen.blit(scaled_image(game_state.card_back, (CARD_WIDTH, CARD_HEIGHT), hidden=True), (DRAW_AREA_X, DRAW_AREA_Y['opponent'] + 5))
+        if thinking is not None:
+            draw_thinking(screen, thinking, DRAW_AREA_X, DRAW_AREA_Y['opponent'] - 35)
+
+        if result:
+            show_winner_message(screen, result[0], SCREEN_WIDTH, SCREEN_HEIGHT)
+
+
 # MAIN
-def main():
+def main(profile_path=None, show_profiler=False, server_address=None):
+    started = time.perf_counter()
+
     # PYGAME INITIALIZATION 
     pygame.init()
     os.environ['SDL_VIDEO_CENTERED'] = '1'
@@ -443,134 +779,208 @@ def main():
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption('Card Game')
 
+    # Decode the heavy assets in the background and show the bare table and menu in the meantime
+    loader = AssetLoader(SCREEN_WIDTH, SCREEN_HEIGHT)
+    layout = board_layout(SCREEN_WIDTH, SCREEN_HEIGHT)
+    DRAW_AREA_X, DRAW_AREA_Y = layout.draw_area_x, layout.draw_area_y
+    ROW_AREA_X_initial, ROW_AREA_Y = layout.row_area_x, layout.row_area_y
+    screen.blit(build_background(SCREEN_WIDTH, SCREEN_HEIGHT, None, layout), (0, 0))
+    for button in make_buttons(SCREEN_HEIGHT):
+        draw_ui(screen, button)
+    pygame.display.flip()
+    first_frame_time = time.perf_counter() - started
+
     # Initialize core functions
-    background_texture = load_background(SCREEN_WIDTH, SCREEN_HEIGHT)
-    card_sprites = load_assets()
-    card_back = pygame.image.load(os.path.join('assets', 'card_back.png')).convert_alpha()
-    game_state = GameState(card_sprites, card_back)
-    arrow_player = pygame.image.load(os.path.join('assets', 'arrow_player.png')).convert_alpha()
-    arrow_opponent = pygame.image.load(os.path.join('assets', 'arrow_opponent.png')).convert_alpha()
+    archive = RecordWriter(RECORD_FILE) if RECORD_FILE else None
+    hand_table = load_table(HAND_TABLE_FILE) if HAND_TABLE_FILE else None
     drag_card = None 
     drag_offset_x, drag_offset_y = 0, 0
     clock = pygame.time.Clock()
-    DRAW_AREA_X = SCREEN_WIDTH - 250 
-    DRAW_AREA_Y = {'player': SCREEN_HEIGHT - 290, 'opponent': 100, 'deck': SCREEN_HEIGHT / 2 - 95}
-    ROW_AREA_X_initial = MENU_WIDTH + 60 + 75
-    ROW_AREA_Y = {'player': SCREEN_HEIGHT / 2 + 50, 'opponent': SCREEN_HEIGHT / 2 - 240}
-    shuffle_button = Button(65, SCREEN_HEIGHT - 265, MENU_WIDTH - 10, 75, 'Shuffle', CONFIG['button-bg'], CONFIG['button-dark'], CONFIG['white'], game_state.shuffle_deck)
-    draw_button = Button(65, SCREEN_HEIGHT - 175, MENU_WIDTH - 10, 75, 'Draw', CONFIG['button-bg'], CONFIG['button-dark'], CONFIG['white'], game_state.draw_card)
-    buttons = [shuffle_button, draw_button]
+    equity = EquityEstimator()
+    opponent_turn = TurnScheduler(AI_DIFFICULTY, AI_WORKER)
+    remote = RemoteOpponent(MatchClient(*server_address)) if server_address else None
 
+    # The window can still be closed while the assets finish loading
     running = True
-    while running:
-        screen.fill(CONFIG['green'])
-        if background_texture:
-            screen.blit(background_texture, (0,0))
-
-        # Menu and button overlays 
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        pygame.draw.rect(overlay, CONFIG['menu-bg'], (60, 0, MENU_WIDTH, SCREEN_HEIGHT))
-        pygame.draw.rect(overlay, CONFIG['button-bg'], (59, -3, MENU_WIDTH + 2, SCREEN_HEIGHT + 6), width=2) # Menu outline
-
-        # Card area/shadow overlays
-        pygame.draw.rect(overlay, CONFIG['grey_transparent'], (DRAW_AREA_X, DRAW_AREA_Y['player'], ((CARD_WIDTH * UI_SCALING) * UI_SCALING) + 10, (CARD_HEIGHT * UI_SCALING)), border_radius=10)
-        pygame.draw.rect(overlay, CONFIG['grey_transparent'], (DRAW_AREA_X, DRAW_AREA_Y['opponent'], (CARD_WIDTH * UI_SCALING) + 10, (CARD_HEIGHT * UI_SCALING) + 10), border_radius=10)
-        pygame.draw.rect(overlay, CONFIG['grey_transparent'], (DRAW_AREA_X, DRAW_AREA_Y['deck'] + 5, (CARD_WIDTH * UI_SCALING) + 5, (CARD_HEIGHT * UI_SCALING) - 5), border_radius=10)
-        screen.blit(overlay, (0,0))
-
-        # Deck Visual Creation
-        game_state.deck.draw_stack(screen, DRAW_AREA_X, DRAW_AREA_Y['deck'] - 2)
-        draw_deck_counter(screen, len(game_state.deck.cards), DRAW_AREA_X + 100, DRAW_AREA_Y['deck'] + 195)
-       
-        # Handle mouse hover detection for cards
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        for row in game_state.player_hand:
-            for card in row:
-                card.hovered = card.rect.collidepoint(mouse_x, mouse_y)
-
-        # Draw cards from the players initial hands
-        draw_hand(screen, game_state.player_hand, ROW_AREA_X_initial, ROW_AREA_Y['player'], PLAYER_SHADOW_OFFSETS)
-        draw_hand(screen, game_state.opponent_hand, ROW_AREA_X_initial, ROW_AREA_Y['opponent'], OPPONENT_SHADOW_OFFSETS, is_opponent=True)
-
-        # Draw Buttons
-        for i in range(len(buttons)):
-            draw_ui(screen, buttons[i])
-
-        # Draw initial menu game state overlay
-        if not game_state.player_hand: 
-            menu_row_state(screen, SCREEN_WIDTH, SCREEN_HEIGHT)
-
-        # Draw row indicators on the board
-        if game_state.player_hand:
-            current_state = compare_rows(game_state.player_hand, game_state.opponent_hand)
-            menu_row_state(screen, SCREEN_WIDTH, SCREEN_HEIGHT, state=current_state, player_hand=game_state.player_hand, opponent_hand=game_state.opponent_hand)
-
-        # Draw player's initial card
-        if game_state.drawn_card:
-            card_x, card_y = pygame.mouse.get_pos() if drag_card else (DRAW_AREA_X, DRAW_AREA_Y['player'] - 5)
-            game_state.drawn_card.draw(screen, card_x - drag_offset_x, card_y - drag_offset_y)
-
-        for event in pygame.event.get():
-            # Initialize Button Utility
-            for button in buttons:
-                button.handle_event(event)
+    while running and not loader.ready.wait(1 / 60):
+        running = not any(event.type == pygame.QUIT for event in pygame.event.get())
+    background_texture, face_atlas, card_back = loader.finish()
+    game_state = GameState(face_atlas, card_back, archive, hand_table)
+    
+    def shuffle():
+        if remote:
+            remote.join()
+            return
+        opponent_turn.cancel()
+        game_state.shuffle_deck()
+        deal_cards(game_state, layout)
+
+    def draw():
+        # Over the network the server draws for whoever is to move
+        if game_state.player_turn and not remote:
+            game_state.draw_card()
+            draw_from_deck(game_state, layout)
+
+    buttons = make_buttons(SCREEN_HEIGHT, shuffle, draw)
+    background = build_background(SCREEN_WIDTH, SCREEN_HEIGHT, background_texture, layout)
+    renderer = DirtyRenderer(screen.get_rect())
+    quiet_since = last_update = time.perf_counter()
+    update_lag = 0.0
+    profiler = FrameProfiler(CONFIG['font'], export_path=profile_path, show_hud=show_profiler)
+    interactive_time = None
 
-            # Allows game to be quit 
-            if event.type == pygame.QUIT:
-                running = False
+    while running:
+        profiler.start_frame()
+        ai_card = None
+        with profiler.phase('events'):
+            events = pygame.event.get()
+            for event in events:
+                # Initialize Button Utility
+                for button in buttons:
+                    button.handle_event(event)
+
+                # Allows game to be quit 
+                if event.type == pygame.QUIT:
+                    running = False
         
-            # Allows card to be clicked and be dragged
-            elif event.type == pygame.MOUSEBUTTONDOWN and game_state.player_turn and game_state.drawn_card:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
-                if game_state.drawn_card.rect.collidepoint(mouse_x, mouse_y):
-                    drag_card = game_state.drawn_card
-                    drag_offset_x = mouse_x - game_state.drawn_card.rect.x
-                    drag_offset_y = mouse_y - game_state.drawn_card.rect.y
+                # Allows card to be clicked and be dragged
+                elif event.type == pygame.MOUSEBUTTONDOWN and game_state.player_turn and game_state.drawn_card is not None:
+                    mouse_x, mouse_y = pygame.mouse.get_pos()
+                    drawn_card = game_state.card(game_state.drawn_card)
+                    if drawn_card.rect.collidepoint(mouse_x, mouse_y):
+                        drag_card = drawn_card
+                        game_state.animator.finish(drag_card, 'offset')
+                        drag_offset_x = mouse_x - drawn_card.rect.x
+                        drag_offset_y = mouse_y - drawn_card.rect.y
         
-            # Checks if the card is let go in a valid row
-            elif event.type == pygame.MOUSEBUTTONUP and drag_card:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
-                for row_index, row in enumerate(game_state.player_hand):
-                    row_x = ROW_AREA_X_initial + (row_index * CARD_SPACING_X)
-                    if row_x < mouse_x < row_x + (CARD_WIDTH * UI_SCALING) and mouse_y > ROW_AREA_Y['player'] - 1:
-                        if validate_row(row, game_state.player_hand):
-                            bounce_card(drag_card)
-                            row.append(drag_card)
-                            game_state.player_turn = False 
-                            drag_card = None
-                            game_state.drawn_card = None
-                            drag_offset_x, drag_offset_y = 0, 0
-                            break
-                drag_card = None
-                drag_offset_x, drag_offset_y = 0, 0
-
-            # Updates card position when the mouse moves
-            elif event.type == pygame.MOUSEMOTION and drag_card:
-                drag_card.rect.x = event.pos[0] + drag_offset_x
-                drag_card.rect.y = event.pos[1] + drag_offset_y
-
-
-            # Allows AI to place card when it's their turn
-            elif not game_state.player_turn:
-                ai_card = game_state.deck.deal_card()
-                ai_card.draw(screen, DRAW_AREA_X, DRAW_AREA_Y['opponent'] + 5, hidden=True)
-                valid_rows = [row for row in game_state.opponent_hand if validate_row(row, game_state.opponent_hand)]
-                if valid_rows:
-                    chosen_row = random.choice(valid_rows)
-                    chosen_row.append(ai_card)
-                game_state.player_turn = True 
-
-            # Check if all rows are full and the game has ended
-            result = check_game_end(game_state.player_hand, game_state.opponent_hand)
-            if result:
-                winner_message = show_winner_message(screen, result[0], SCREEN_WIDTH, SCREEN_HEIGHT)
-
-        pygame.display.flip()
-        clock.tick(60)
+                # Checks if the card is let go in a valid row
+                elif event.type == pygame.MOUSEBUTTONUP and drag_card:
+                    mouse_x, mouse_y = pygame.mouse.get_pos()
+                    for row_index, row in enumerate(game_state.player_hand):
+                        row_x = ROW_AREA_X_initial + (row_index * CARD_SPACING_X)
+                        if row_x < mouse_x < row_x + (CARD_WIDTH * UI_SCALING) and mouse_y > ROW_AREA_Y['player'] - 1:
+                            if game_state.place_card(row_index):
+                                if remote:
+                                    remote.place(row_index)
+                                slot = card_slot(ROW_AREA_X_initial, ROW_AREA_Y['player'], row_index, len(game_state.player_hand[row_index]) - 1)
+                                bounce_card(game_state.animator, drag_card, drag_card.rect.topleft, slot)
+                                drag_card = None
+                                drag_offset_x, drag_offset_y = 0, 0
+                                break
+                    drag_card = None
+                    drag_offset_x, drag_offset_y = 0, 0
+
+                # Updates card position when the mouse moves
+                elif event.type == pygame.MOUSEMOTION and drag_card:
+                    drag_card.rect.x = event.pos[0] + drag_offset_x
+                    drag_card.rect.y = event.pos[1] + drag_offset_y
+
+                # Shows or hides the frame profiler HUD
+                elif event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                    profiler.toggle_hud()
+
+        # The AI draws and starts deciding on its turn, then places the card once the worker has answered.
+        # Over the network the server's messages move the opponent instead
+        with profiler.phase('ai'):
+            if remote:
+                ai_card = remote.poll(game_state, layout)
+                opponent_thinking = ai_card == HIDDEN
+            else:
+                if not game_state.player_turn and not opponent_turn.thinking:
+                    game_state.draw_card()
+                    if game_state.valid_rows() and game_state.drawn_card is not None:
+                        opponent_turn.start(game_state, game_state.rng.random())
+                    else:
+                        game_state.drawn_card = None
+                        game_state.player_turn = True 
+
+                move = opponent_turn.poll(game_state)
+                if move:
+                    (version, code), row_index = move
+                    # Only applied if nothing has changed since the move was started
+                    if (version, code) == (game_state.version, game_state.drawn_card) and game_state.place_card(row_index):
+                        ai_card = code
+                        slot = card_slot(ROW_AREA_X_initial, ROW_AREA_Y['opponent'], row_index, len(game_state.opponent_hand[row_index]) - 1, is_opponent=True)
+                        bounce_card(game_state.animator, game_state.card(ai_card), (DRAW_AREA_X, DRAW_AREA_Y['opponent'] + 5), slot)
+                elif opponent_turn.thinking:
+                    ai_card = game_state.drawn_card
+                opponent_thinking = opponent_turn.thinking
+            thinking = int(time.perf_counter() * 3) % 4 if opponent_thinking else None
+
+        # Animations advance in fixed steps of elapsed time, separate from how often frames are drawn
+        with profiler.phase('update'):
+            now = time.perf_counter()
+            update_lag += min(now - last_update, MAX_FRAME_TIME)
+            last_update = now
+            game_state.sync_row_flames()
+            while update_lag >= UPDATE_STEP:
+                game_state.update(UPDATE_STEP)
+                update_lag -= UPDATE_STEP
+
+            # The equity estimate gets its time budget once per frame
+            if game_state.player_hand:
+                equity.update(game_state)
+
+        # Check if all rows are full and the game has ended
+        result = game_state.result()
+        if result:
+            game_state.archive_game()
+        if remote and remote.status:
+            result = [remote.status, {}]
+        card_x, card_y = pygame.mouse.get_pos() if drag_card else (DRAW_AREA_X, DRAW_AREA_Y['player'] - 5)
+        drawn_position = (card_x - drag_offset_x, card_y - drag_offset_y)
+
+        # Redraw only the parts of the screen that changed
+        regions = scene_regions(game_state, layout, drawn_position, ai_card, equity, result, SCREEN_WIDTH, SCREEN_HEIGHT, thinking)
+        if profiler.show_hud:
+            regions['profiler'] = profiler.hud_region(SCREEN_WIDTH)
+        dirty = renderer.dirty_rects(regions)
+        for rect in dirty:
+            screen.set_clip(rect)
+            draw_frame(screen, background, game_state, layout, buttons, drawn_position, ai_card, equity, result, SCREEN_WIDTH, SCREEN_HEIGHT, thinking, profiler.phase)
+            if profiler.show_hud:
+                profiler.draw_hud(screen, regions['profiler'][0])
+        screen.set_clip(None)
+        with profiler.phase('flip'):
+            pygame.display.update(dirty)
+        profiler.end_frame()
+        if interactive_time is None:
+            interactive_time = time.perf_counter() - started
+            print(f'Startup: first frame {first_frame_time * 1000:.0f} ms, interactive {interactive_time * 1000:.0f} ms', flush=True)
+
+        # Sleep until the next event once nothing has happened for a while
+        now = time.perf_counter()
+        settled = game_state.player_turn and (not game_state.player_hand or equity.converged()) and not game_state.animating() and not (remote and remote.active)
+        if events or dirty or not settled:
+            quiet_since = now
+            clock.tick(60)
+        elif now - quiet_since > IDLE_AFTER:
+            event = pygame.event.wait(IDLE_WAIT_MS)
+            if event.type != pygame.NOEVENT:
+                pygame.event.post(event)
+            clock.tick()
+        else:
+            clock.tick(60)
     
+    opponent_turn.close()
+    if remote:
+        remote.close()
+    profiler.close()
+    game_state.archive_game()
+    if archive:
+        archive.close()
     pygame.quit()
     sys.exit()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Two player card game')
+    parser.add_argument('--profile', metavar='PATH', help='stream per-frame timings to a .csv or .jsonl file')
+    parser.add_argument('--hud', action='store_true', help=f'start with the frame profiler HUD shown, {pygame.key.name(PROFILER_KEY).upper()} toggles it')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='play against whoever else joins a server.py match server instead of the AI')
+    args = parser.parse_args()
+    server_address = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        server_address = (host or 'localhost', int(port))
+    main(args.profile, args.hud, server_address)
@@ -0,0 +1,156 @@
+# AUTHOR - MATTHEW RAYNER | PLACEMENT POLICIES
+
+
+# LIBRARIES
+import time
+from collections import OrderedDict
+from endgame import EndgameSolver, placements_left
+from engine import rank_hand
+from equity import board_score, fill_open_slots
+from hand_table import TABLE_FILE, load_table
+
+
+# A policy is called as policy(game, rng) with game.drawn_card set for the side to move
+# (game.player_turn) and returns the index of the row to place it into. Any callable works,
+# classes only need a __call__ with the same signature. The DIFFICULTIES also take an optional stop,
+# anything with an is_set() such as an Event, and return the best row found so far once it is set
+
+
+# CLASSES
+class RolloutPolicy:
+    """ Monte Carlo policy that plays random completions of both boards for every row the card may go into,
+        stopping at a per-move time budget or rollout budget, whichever comes first. With no time budget and a
+        cache_size of 0 a move only depends on the position and the rng """
+    prior_weight = 2 # Rollouts' worth of trust given to the rank_hand heuristic
+
+    def __init__(self, time_budget=0.05, max_rollouts=2000, cache_size=50000):
+        self.time_budget = time_budget
+        self.max_rollouts = max_rollouts
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def __call__(self, game, rng, stop=None):
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        hand, other = (game.player_hand, game.opponent_hand) if game.player_turn else (game.opponent_hand, game.player_hand)
+        card = game.drawn_card
+        candidates = game.valid_rows()
+        if len(candidates) == 1:
+            return candidates[0]
+
+        stats = self.lookup(canonical_key(hand, other, card), candidates)
+        priors = {i: row_prior(list(hand[i]) + [card], other[i]) for i in candidates}
+        unseen = list(game.deck.cards)
+        rollouts = sum(stats[i][1] for i in candidates)
+        hand_rows, other_rows = [list(row) for row in hand], [list(row) for row in other]
+
+        while rollouts < self.max_rollouts and (deadline is None or time.perf_counter() < deadline) and not (stop and stop.is_set()):
+            for i in candidates:
+                mover = [row[:] for row in hand_rows]
+                opposing = [row[:] for row in other_rows]
+                mover[i].append(card)
+                rng.shuffle(unseen)
+                fill_open_slots(mover, opposing, unseen)
+                score = board_score(mover, opposing)
+                stats[i][0] += 1 if score > 0 else 0.5 if score == 0 else 0
+                stats[i][1] += 1
+            rollouts += len(candidates)
+
+        def value(i):
+            total, samples = stats[i]
+            return (total + priors[i] * self.prior_weight) / (samples + self.prior_weight)
+
+        return max(candidates, key=lambda i: (value(i), priors[i]))
+
+    def lookup(self, key, candidates):
+        """ Returns the rollout totals already gathered for a position, so repeated positions carry on from them """
+        stats = self.cache.get(key)
+        if stats is None:
+            stats = {i: [0, 0] for i in candidates}
+            self.cache[key] = stats
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return stats
+
+
+class EndgamePolicy:
+    """ Plays the exact EndgameSolver move once few enough placements are left for it to finish in time,
+        falls back to another policy earlier in the game or when the solve hits its limits.
+        Without keep_table the solver's table is emptied before every solve, so no move depends on earlier ones """
+    def __init__(self, fallback, max_placements=6, max_nodes=200000, time_limit=0.5, max_entries=200000, keep_table=True):
+        self.fallback = fallback
+        self.max_placements = max_placements
+        self.keep_table = keep_table
+        self.solver = EndgameSolver(max_nodes=max_nodes, time_limit=time_limit, max_entries=max_entries)
+
+    def __call__(self, game, rng, stop=None):
+        if placements_left(game) <= self.max_placements:
+            if not self.keep_table:
+                self.solver.table.clear()
+            result = self.solver.solve(game, stop=stop)
+            if result is not None:
+                return result.best_row
+        return self.fallback(game, rng, stop)
+
+
+class TablePolicy:
+    """ Greedy policy that puts the card where it adds the most to the row's precomputed win chance
+        against a random completed row, one table lookup per allowed row """
+    def __init__(self, path=TABLE_FILE):
+        self.path = path
+
+    def __call__(self, game, rng):
+        table = load_table(self.path)
+        if table is None:
+            raise FileNotFoundError(f'{self.path} not found or not a hand table, build it with python hand_table.py build')
+        hand = game.player_hand if game.player_turn else game.opponent_hand
+        card = game.drawn_card
+        return max(game.valid_rows(), key=lambda i: table.win_chance(list(hand[i]) + [card]) - table.win_chance(hand[i]))
+
+
+# FUNCTIONS
+def random_policy(game, rng, stop=None):
+    """ The original opponent AI, picks any row the card is allowed in """
+    return rng.choice(game.valid_rows())
+
+
+def canonical_key(hand, other, card):
+    """ Compact position key from the side to move's view, the order of cards within a row does not matter """
+    return hand.key() + other.key() + bytes((card,))
+
+
+def row_prior(row, other_row):
+    """ Heuristic chance of winning a row from the current rank_hand strengths alone """
+    row_rank, other_rank = rank_hand(row), rank_hand(other_row)
+    if row_rank > other_rank:
+        return 1.0
+    elif row_rank == other_rank:
+        return 0.5
+    return 0.0
+
+
+# The window's opponents, budgeted in seconds so a move never keeps the player waiting
+DIFFICULTIES = {
+    'easy': random_policy,
+    'medium': RolloutPolicy(time_budget=0.02, max_rollouts=300),
+    'hard': EndgamePolicy(RolloutPolicy(time_budget=0.1, max_rollouts=2000), max_placements=4),
+    'expert': EndgamePolicy(RolloutPolicy(time_budget=0.25, max_rollouts=10000), max_placements=6)
+}
+
+# The same opponents for self-play, tournaments and recorded games, with only rollout and node budgets and nothing
+# carried over between moves, so a game played
+# with the same seed always comes out the same however fast the machine is and however many workers share it
+REPRODUCIBLE_DIFFICULTIES = {
+    'easy': random_policy,
+    'medium': RolloutPolicy(time_budget=None, max_rollouts=300, cache_size=0),
+    'hard': EndgamePolicy(RolloutPolicy(time_budget=None, max_rollouts=2000, cache_size=0), max_placements=4, time_limit=None, keep_table=False),
+    'expert': EndgamePolicy(RolloutPolicy(time_budget=None, max_rollouts=10000, cache_size=0), max_placements=6, time_limit=None, keep_table=False)
+}
+
+POLICIES = {
+    'random': random_policy,
+    'rollout': RolloutPolicy(time_budget=None, max_rollouts=500, cache_size=0),
+    'table': TablePolicy(),
+    **REPRODUCIBLE_DIFFICULTIES
+}
@@ -0,0 +1,168 @@
+# AUTHOR - MATTHEW RAYNER | FRAME PROFILER
+
+
+# LIBRARIES
+import csv
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+import pygame
+from render_cache import CARD_CACHE, SHADOW_CACHE, TEXT_CACHE, get_font
+
+
+# CONSTANTS
+PHASES = ['events', 'ai', 'update', 'background', 'deck', 'player_hand', 'opponent_hand', 'buttons', 'menu', 'overlay', 'flip']
+HUD_REFRESH = 30 # Frames between HUD text updates, so the HUD itself is not redrawn every frame
+HUD_COLOR = (255, 255, 255)
+HUD_BACKGROUND = (0, 0, 0, 170)
+NULL_PHASE = nullcontext()
+
+
+# CLASSES
+class Phase:
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.begin(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profiler.end()
+
+
+class FrameProfiler:
+    """ Opt-in per-phase timings for the main loop. Phases nest, a phase's time excludes any phase started inside it,
+        so the AI move is not counted again under event handling. Surfaces built per frame are the misses of the
+        render caches, which is where the draw code allocates. Frames are kept in a rolling window for the HUD
+        and streamed to a .csv or .jsonl file when export_path is given """
+    def __init__(self, font_path, window=300, export_path=None, show_hud=False):
+        self.font_path = font_path
+        self.records = deque(maxlen=window)
+        self.show_hud = show_hud
+        self.phases = {name: Phase(self, name) for name in PHASES}
+        self.stack = []
+        self.frame = 0
+        self.frame_start = None
+        self.hud_lines = self.summary() if show_hud else ()
+        self.hud_cache = None
+        self.export_file = None
+        self.writer = None
+        if export_path:
+            self.export_file = open(export_path, 'w', newline='')
+            if export_path.endswith('.csv'):
+                self.writer = csv.DictWriter(self.export_file, ['frame', 'interval_ms', 'frame_ms', *PHASES, 'surfaces'])
+                self.writer.writeheader()
+
+    @property
+    def enabled(self):
+        return self.show_hud or self.export_file is not None
+
+    def toggle_hud(self):
+        self.show_hud = not self.show_hud
+        self.hud_lines = self.summary() if self.show_hud else ()
+
+    def phase(self, name):
+        """ Context manager timing a block as the named phase, a shared no-op while the profiler is off """
+        return self.phases[name] if self.frame_start is not None else NULL_PHASE
+
+    def begin(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            self.times[self.stack[-1]] += now - self.mark
+        self.stack.append(name)
+        self.mark = now
+
+    def end(self):
+        now = time.perf_counter()
+        self.times[self.stack.pop()] += now - self.mark
+        self.mark = now
+
+    def start_frame(self):
+        if not self.enabled:
+            self.frame_start = None
+            return
+        now = time.perf_counter()
+        self.interval = now - self.frame_start if self.frame_start is not None else 0.0
+        self.frame_start = now
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.misses = cache_misses()
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        record = {
+            'frame': self.frame,
+            'interval_ms': round(self.interval * 1000, 3),
+            'frame_ms': round((time.perf_counter() - self.frame_start) * 1000, 3),
+            **{name: round(seconds * 1000, 3) for name, seconds in self.times.items()},
+            'surfaces': cache_misses() - self.misses
+        }
+        self.records.append(record)
+        self.frame += 1
+
+        if self.writer:
+            self.writer.writerow(record)
+        elif self.export_file:
+            self.export_file.write(json.dumps(record) + '\n')
+        if self.show_hud and not self.frame % HUD_REFRESH:
+            self.hud_lines = self.summary()
+
+    def summary(self):
+        """ HUD text: rolling frame time percentiles, then the mean of each phase that took any time """
+        if not self.records:
+            return ('collecting frames...',)
+        frame_times = sorted(record['frame_ms'] for record in self.records)
+        count = len(frame_times)
+        lines = [
+            f'frame p50 {percentile(frame_times, 50):.2f} p95 {percentile(frame_times, 95):.2f} p99 {percentile(frame_times, 99):.2f} ms',
+            f'surfaces/frame {sum(record["surfaces"] for record in self.records) / count:.1f}'
+        ]
+        for name in PHASES:
+            mean = sum(record[name] for record in self.records) / count
+            if mean >= 0.005:
+                lines.append(f'{name:<14}{mean:6.2f} ms')
+        return tuple(lines)
+
+    def hud_surface(self):
+        """ The HUD panel, rebuilt only when its text changes """
+        if self.hud_cache is None or self.hud_cache[0] != self.hud_lines:
+            font = get_font(self.font_path, 16)
+            line_height = font.get_linesize()
+            surface = pygame.Surface((max(font.size(line)[0] for line in self.hud_lines) + 20, len(self.hud_lines) * line_height + 16), pygame.SRCALPHA)
+            pygame.draw.rect(surface, HUD_BACKGROUND, surface.get_rect(), border_radius=6)
+            for i, line in enumerate(self.hud_lines):
+                surface.blit(font.render(line, True, HUD_COLOR), (10, 8 + i * line_height))
+            self.hud_cache = (self.hud_lines, surface)
+        return self.hud_cache[1]
+
+    def hud_region(self, screen_width):
+        """ (rect, signature) of the HUD in the top right corner for the dirty rectangle renderer """
+        return self.hud_surface().get_rect(topright=(screen_width - 10, 10)), self.hud_lines
+
+    def draw_hud(self, screen, rect):
+        screen.blit(self.hud_surface(), rect)
+
+    def close(self):
+        if self.export_file:
+            self.export_file.close()
+            self.export_file = self.writer = None
+
+
+# FUNCTIONS
+def cache_misses():
+    return CARD_CACHE.misses + SHADOW_CACHE.misses + TEXT_CACHE.misses
+
+
+def percentile(sorted_values, percent):
+    """ Nearest-rank percentile of an already sorted list """
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def no_phase(name):
+    """ Stands in for FrameProfiler.phase where no profiler is attached """
+    return NULL_PHASE
@@ -0,0 +1,119 @@
+# AUTHOR - MATTHEW RAYNER | MATCH PROTOCOL
+
+
+# LIBRARIES
+import socket
+from engine import ROWS
+
+
+# Every message is a length byte counting the bytes after it, a type byte and a fixed size payload of small integers.
+# Sides are relative to whoever receives the message, YOU or THEM. The server deals, draws for the side to move
+# and checks every placement, clients only ever send JOIN and PLACE, and are told about each placement rather than
+# sent whole boards. A match is called off when a side disconnects, runs out of time or stops reading:
+#   JOIN        client  find a match                                        -
+#   PLACE       client  put the drawn card into a row                       row
+#   START       server  a match has begun                                   side to move first, the first card of your rows, then theirs
+#   DRAWN       server  the side to move has drawn                          side, card (HIDDEN when it is theirs)
+#   PLACED      server  a card has been placed                              side, row, card
+#   REJECTED    server  your last message was refused                       reason
+#   END         server  every row is full                                   winner of each row, YOU, THEM or DRAW
+#   LEFT        server  the match was called off                            -
+
+# CONSTANTS
+JOIN = 1
+PLACE = 2
+START = 16
+DRAWN = 17
+PLACED = 18
+REJECTED = 19
+END = 20
+LEFT = 21
+PAYLOAD_SIZES = {JOIN: 0, PLACE: 1, START: 1 + 2 * ROWS, DRAWN: 2, PLACED: 3, REJECTED: 1, END: ROWS, LEFT: 0}
+YOU = 0
+THEM = 1
+DRAW = 2
+HIDDEN = 0xFF
+NOT_IN_MATCH = 1
+NOT_YOUR_TURN = 2
+ROW_NOT_ALLOWED = 3
+ALREADY_PLAYING = 4
+READ_SIZE = 4096
+
+
+# CLASSES
+class ProtocolError(ValueError):
+    pass
+
+
+class FrameParser:
+    """ Splits a byte stream into (type, payload) messages, keeping any partial message for the next feed """
+    __slots__ = ('buffer',)
+
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        buffer = self.buffer + data if self.buffer else data
+        messages = []
+        offset = 0
+        while offset < len(buffer) and offset + 1 + buffer[offset] <= len(buffer):
+            length = buffer[offset]
+            if not length:
+                raise ProtocolError('empty message')
+            kind = buffer[offset + 1]
+            if PAYLOAD_SIZES.get(kind) != length - 1:
+                raise ProtocolError(f'message type {kind} with {length - 1} payload bytes')
+            messages.append((kind, buffer[offset + 2:offset + 1 + length]))
+            offset += 1 + length
+        self.buffer = buffer[offset:]
+        return messages
+
+
+class MatchClient:
+    """ Non-blocking client for a game loop: send() queues a message and poll(), called once a frame, sends what is
+        queued and returns the messages that have arrived. closed is set once the server hangs up """
+    def __init__(self, host, port, timeout=5.0):
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setblocking(False)
+        self.parser = FrameParser()
+        self.outgoing = b''
+        self.closed = False
+
+    def send(self, kind, *values):
+        self.outgoing += encode(kind, *values)
+
+    def poll(self):
+        if self.closed:
+            return []
+        data = b''
+        try:
+            if self.outgoing:
+                sent = self.socket.send(self.outgoing)
+                self.outgoing = self.outgoing[sent:]
+            while True:
+                chunk = self.socket.recv(READ_SIZE)
+                if not chunk:
+                    self.closed = True
+                    break
+                data += chunk
+        except BlockingIOError:
+            pass
+        except OSError:
+            self.closed = True
+        return self.parser.feed(data) if data else []
+
+    def close(self):
+        self.closed = True
+        self.socket.close()
+
+
+# FUNCTIONS
+def encode(kind, *values):
+    return bytes((len(values) + 1, kind, *values))
+
+
+def relative_winners(row_wins, side):
+    """ END payload for the side (0 the player, 1 the opponent) from a compare_rows row_wins dict """
+    names = ['player', 'opponent']
+    return [DRAW if row_wins[i] == 'draw' else YOU if row_wins[i] == names[side] else THEM for i in range(ROWS)]
@@ -0,0 +1,293 @@
+# AUTHOR - MATTHEW RAYNER | COMPACT GAME RECORDS
+
+
+# LIBRARIES
+import argparse
+import os
+import time
+from collections import namedtuple
+from multiprocessing import Pool
+from engine import CARDS_PER_ROW, DECK_SIZE, DISCARD, RESULT_WINNERS, ROWS, Game, compare_strengths, play_game
+from policies import POLICIES
+from tournament import SIDES, empty_totals, game_rng, merge_totals, print_report
+
+
+# A record is self-delimiting so records can simply be appended to one archive file:
+#   byte 0      number of moves
+#   byte 1      outcome, each row's winner as a base-3 digit (player, opponent, draw), UNFINISHED if the game never ended
+#   byte 2      length of the moves field in bytes
+#   29 bytes    the deal order as a permutation index (52! < 2^232)
+#   n bytes     the moves in mixed radix, each move is the index of its row among the rows it was allowed in,
+#               or one past the last for a discarded card, so a full game's 40 placements take at most 10 bytes
+# The side of every move is not stored, turns alternate starting with the player and a discard does not pass the turn
+
+# CONSTANTS
+GameRecord = namedtuple('GameRecord', ['deal_order', 'moves', 'outcome'])
+HEADER_SIZE = 3
+DEAL_SIZE = 29
+UNFINISHED = 0xFF
+FACTORIAL_RADICES = range(DECK_SIZE, 0, -1)
+READ_SIZE = 1 << 20
+
+
+# CLASSES
+class RecordWriter:
+    """ Appends encoded records to an archive file, each one flushed as it is written so a crash loses none """
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+
+    def write(self, record):
+        self.file.write(encode(record))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class FillRounds:
+    """ The rows each side may place into, validate_row kept up to date one placement at a time. Rows fill in rounds,
+        a row can only be used again once every row of that side has caught up with it """
+    __slots__ = ('open', 'rounds')
+
+    def __init__(self):
+        self.open = [list(range(ROWS)), list(range(ROWS))]
+        self.rounds = [1, 1]
+
+    def place(self, side, position):
+        """ Takes the row at position out of the side's open rows and returns its index """
+        allowed = self.open[side]
+        row_index = allowed.pop(position)
+        if not allowed and self.rounds[side] < CARDS_PER_ROW - 1:
+            allowed.extend(range(ROWS))
+            self.rounds[side] += 1
+        return row_index
+
+
+# FUNCTIONS
+def record_game(game):
+    """ The GameRecord of a Game, finished or not """
+    result = game.result()
+    return GameRecord(game.deal_order, bytes(game.moves), encode_outcome(result[1]) if result else UNFINISHED)
+
+
+def encode_outcome(row_wins):
+    outcome = 0
+    for row_index in reversed(range(ROWS)):
+        outcome = outcome * 3 + SIDES.index(row_wins[row_index])
+    return outcome
+
+
+def decode_outcome(outcome):
+    """ The compare_rows result stored in an outcome byte, None for an unfinished game """
+    if outcome == UNFINISHED:
+        return None
+    row_wins = {}
+    for row_index in range(ROWS):
+        outcome, winner = divmod(outcome, 3)
+        row_wins[row_index] = SIDES[winner]
+    strengths = [(winner == 'player') - (winner == 'opponent') for winner in row_wins.values()]
+    return compare_strengths(strengths, [0] * ROWS)
+
+
+def move_radices(moves):
+    """ Yields (radix, digit) for each move, replaying the fill rounds to know how many rows each was allowed in """
+    fill = FillRounds()
+    side = 0
+    for move in moves:
+        allowed = fill.open[side]
+        if move == DISCARD:
+            yield len(allowed) + 1, len(allowed)
+            continue
+        position = allowed.index(move)
+        yield len(allowed) + 1, position
+        fill.place(side, position)
+        side ^= 1
+
+
+def encode(record):
+    deal_index = 0
+    remaining = list(range(DECK_SIZE))
+    for radix, code in zip(FACTORIAL_RADICES, record.deal_order):
+        position = remaining.index(code)
+        remaining.pop(position)
+        deal_index = deal_index * radix + position
+
+    move_index = 0
+    for radix, digit in reversed(list(move_radices(record.moves))):
+        move_index = move_index * radix + digit
+    moves_field = move_index.to_bytes((move_index.bit_length() + 7) // 8, 'little')
+
+    return bytes((len(record.moves), record.outcome, len(moves_field))) + deal_index.to_bytes(DEAL_SIZE, 'little') + moves_field
+
+
+def decode(data, offset=0):
+    """ Reads the record at offset, returns (GameRecord, offset of the next record) """
+    move_count, outcome, moves_size = data[offset:offset + HEADER_SIZE]
+    start = offset + HEADER_SIZE
+    deal_index = int.from_bytes(data[start:start + DEAL_SIZE], 'little')
+    move_index = int.from_bytes(data[start + DEAL_SIZE:start + DEAL_SIZE + moves_size], 'little')
+
+    positions = []
+    for radix in reversed(FACTORIAL_RADICES):
+        deal_index, position = divmod(deal_index, radix)
+        positions.append(position)
+    remaining = list(range(DECK_SIZE))
+    deal_order = bytes(remaining.pop(position) for position in reversed(positions))
+
+    # Digits come out least significant first, each radix depends on the moves decoded before it
+    moves = bytearray()
+    fill = FillRounds()
+    side = 0
+    for _ in range(move_count):
+        choices = len(fill.open[side])
+        move_index, digit = divmod(move_index, choices + 1)
+        if digit == choices:
+            moves.append(DISCARD)
+            continue
+        moves.append(fill.place(side, digit))
+        side ^= 1
+
+    return GameRecord(deal_order, bytes(moves), outcome), start + DEAL_SIZE + moves_size
+
+
+def replay(record, game=None):
+    """ Plays a record through the rules engine, returns the Game or None if a move was not allowed.
+        Passing the previous replay's game back in saves building and shuffling a new one """
+    if game is None:
+        game = Game()
+    game.deck.cards[:] = reversed(record.deal_order)
+    game.deal_hands()
+    for move in record.moves:
+        game.draw_card()
+        if move != DISCARD and not game.place_card(move):
+            return None
+    return game
+
+
+def iter_record_blocks(path, records_per_block=5000):
+    """ Streams an archive as byte blocks of whole records, splitting on the header's sizes without decoding """
+    with open(path, 'rb') as archive:
+        buffer = b''
+        block_start = offset = count = 0
+        while True:
+            chunk = archive.read(READ_SIZE)
+            if chunk:
+                buffer = buffer[block_start:] + chunk
+                offset -= block_start
+                block_start = 0
+            while offset + HEADER_SIZE <= len(buffer):
+                end = offset + HEADER_SIZE + DEAL_SIZE + buffer[offset + 2]
+                if end > len(buffer):
+                    break
+                offset = end
+                count += 1
+                if count == records_per_block:
+                    yield buffer[block_start:offset]
+                    block_start, count = offset, 0
+            if not chunk:
+                if offset < len(buffer):
+                    raise ValueError(f'{path} ends with a truncated record')
+                if count:
+                    yield buffer[block_start:offset]
+                return
+
+
+def iter_records(path):
+    for block in iter_record_blocks(path):
+        offset = 0
+        while offset < len(block):
+            record, offset = decode(block, offset)
+            yield record
+
+
+def replay_block(block):
+    """ Replays a block of records and returns tournament totals plus unfinished, illegal and mismatched counts """
+    totals = empty_totals()
+    totals.update(records=0, unfinished=0, illegal=0, mismatched=0)
+    offset = 0
+    game = Game()
+    while offset < len(block):
+        record, offset = decode(block, offset)
+        totals['records'] += 1
+        if replay(record, game) is None:
+            game = Game()
+            totals['illegal'] += 1
+            continue
+        result = game.result()
+        if result is None:
+            totals['unfinished'] += 1
+            continue
+
+        # The outcome stored when the game was played has to match the one worked out again now
+        if decode_outcome(record.outcome) != result:
+            totals['mismatched'] += 1
+        totals['games'] += 1
+        totals[RESULT_WINNERS[result[0]]] += 1
+        for row_index, winner in result[1].items():
+            totals['rows'][row_index][winner] += 1
+    return totals
+
+
+def replay_archive(path, workers=None):
+    """ Replays every record in an archive across a process pool and returns the combined totals """
+    totals = empty_totals()
+    totals.update(records=0, unfinished=0, illegal=0, mismatched=0)
+    workers = workers or os.cpu_count() or 1
+
+    def merge(block_totals):
+        merge_totals(totals, block_totals)
+        for key in ['records', 'unfinished', 'illegal', 'mismatched']:
+            totals[key] += block_totals[key]
+
+    if workers == 1:
+        for block in iter_record_blocks(path):
+            merge(replay_block(block))
+        return totals
+
+    with Pool(workers) as pool:
+        for block_totals in pool.imap_unordered(replay_block, iter_record_blocks(path)):
+            merge(block_totals)
+    return totals
+
+
+def record_games(path, games, player='random', opponent='random', seed=0):
+    """ Plays self-play games with the tournament's seeding and appends their records to an archive """
+    writer = RecordWriter(path)
+    player_policy, opponent_policy = POLICIES[player], POLICIES[opponent]
+    for index in range(games):
+        rng = game_rng(seed, index)
+        game = Game(rng)
+        play_game(player_policy, opponent_policy, rng, game)
+        writer.write(record_game(game))
+    writer.close()
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Writes and replays compact binary game records')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='append self-play games to an archive')
+    record_parser.add_argument('archive')
+    record_parser.add_argument('-n', '--games', type=int, default=10000)
+    record_parser.add_argument('--player', choices=sorted(POLICIES), default='random')
+    record_parser.add_argument('--opponent', choices=sorted(POLICIES), default='random')
+    record_parser.add_argument('--seed', type=int, default=0)
+    replay_parser = commands.add_parser('replay', help='replay an archive and report outcomes')
+    replay_parser.add_argument('archive')
+    replay_parser.add_argument('--workers', type=int, default=None, help='defaults to one per CPU')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'record':
+        record_games(args.archive, args.games, args.player, args.opponent, args.seed)
+        print(f'{args.games} games appended to {args.archive} ({os.path.getsize(args.archive)} bytes) in {time.perf_counter() - start:.2f}s')
+        return
+
+    totals = replay_archive(args.archive, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f'{totals["records"]} records replayed ({totals["records"] / max(elapsed, 1e-9):.0f}/s): {totals["unfinished"]} unfinished, {totals["illegal"]} illegal, {totals["mismatched"]} outcome mismatches')
+    print_report(totals, 'recorded', 'recorded', elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# AUTHOR - MATTHEW RAYNER | RENDER CACHES
+
+
+# LIBRARIES
+from collections import OrderedDict
+import pygame
+
+
+# CONSTANTS
+SCALE_STEP = 0.005 # Hover scales are snapped to this step so the animation reuses a handful of sizes
+SHADOW_COLOR = (0, 0, 0, 80)
+
+
+# CLASSES
+class SurfaceCache:
+    """ Bounded least-recently-used cache of built surfaces """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = build()
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+
+CARD_CACHE = SurfaceCache(512)
+SHADOW_CACHE = SurfaceCache(16)
+TEXT_CACHE = SurfaceCache(256)
+FONTS = {}
+
+
+# FUNCTIONS
+def quantize_scale(scale):
+    return round(scale / SCALE_STEP) * SCALE_STEP
+
+
+def scaled_image(image, size, rotate=False, hidden=False):
+    """ Returns the image scaled to size (and turned 180 degrees if rotate), building it only on a cache miss """
+    if image.get_size() == size and not rotate:
+        return image
+
+    # The source is kept in the entry so a recycled id() can never return another image's surface
+    key = (id(image), size, rotate, hidden)
+    source, surface = CARD_CACHE.get(key, lambda: (image, build_scaled(image, size, rotate)))
+    if source is not image:
+        CARD_CACHE.entries[key] = (image, build_scaled(image, size, rotate))
+        return CARD_CACHE.entries[key][1]
+    return surface
+
+
+def build_scaled(image, size, rotate):
+    surface = pygame.transform.scale(image, size)
+    if rotate:
+        surface = pygame.transform.rotate(surface, 180)
+    return surface
+
+
+def card_shadow(size, border_radius=10):
+    """ Returns the translucent rounded shadow drawn under cards, rendered once per size """
+    def build():
+        shadow_surface = pygame.Surface(size, pygame.SRCALPHA)
+        pygame.draw.rect(shadow_surface, SHADOW_COLOR, (0, 0, size[0], size[1]), border_radius=border_radius)
+        return shadow_surface
+    return SHADOW_CACHE.get((size, border_radius), build)
+
+
+def get_font(path, size):
+    """ Returns the font for a (path, size), loading the file only the first time """
+    font = FONTS.get((path, size))
+    if font is None:
+        font = FONTS[(path, size)] = pygame.font.Font(path, size)
+    return font
+
+
+def render_text(path, size, text, color):
+    """ Returns the antialiased text surface for a string, rendering it only on a cache miss """
+    color = tuple(color)
+    return TEXT_CACHE.get((path, size, text, color), lambda: get_font(path, size).render(text, True, color))
@@ -0,0 +1,61 @@
+# AUTHOR - MATTHEW RAYNER | DIRTY RECTANGLE RENDERER
+
+
+# LIBRARIES
+import pygame
+
+
+# CLASSES
+class DirtyRenderer:
+    """ Works out which parts of the screen changed since the last frame. Each frame describes its regions as
+        {key: (rect, signature)}, a region is dirty when it appears, disappears, moves or its signature changes """
+    def __init__(self, screen_rect, full_redraw_ratio=0.6):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.full_redraw_ratio = full_redraw_ratio
+        self.regions = {}
+        self.full_redraw = True
+
+    def invalidate(self):
+        """ Forces the next frame to redraw the whole screen """
+        self.full_redraw = True
+
+    def dirty_rects(self, regions):
+        previous_regions, self.regions = self.regions, regions
+        if self.full_redraw:
+            self.full_redraw = False
+            return [self.screen_rect.copy()]
+
+        dirty = []
+        for key, region in regions.items():
+            previous = previous_regions.get(key)
+            if previous != region:
+                dirty.append(region[0])
+                if previous is not None:
+                    dirty.append(previous[0])
+        for key, (rect, _) in previous_regions.items():
+            if key not in regions:
+                dirty.append(rect)
+
+        dirty = merge_rects([rect.clip(self.screen_rect) for rect in dirty])
+        if sum(rect.width * rect.height for rect in dirty) > self.full_redraw_ratio * self.screen_rect.width * self.screen_rect.height:
+            return [self.screen_rect.copy()]
+        return dirty
+
+
+# FUNCTIONS
+def merge_rects(rects):
+    """ Unions overlapping rects so no pixel is redrawn twice in a frame """
+    merged = []
+    for rect in rects:
+        if not rect.width or not rect.height:
+            continue
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
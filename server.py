@@ -0,0 +1,270 @@
+# AUTHOR - MATTHEW RAYNER | MATCH SERVER
+
+
+# LIBRARIES
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import time
+import tracemalloc
+from collections import deque
+from engine import Game
+from protocol import (DRAWN, END, HIDDEN, JOIN, LEFT, PLACE, PLACED, REJECTED, START, THEM, YOU, ALREADY_PLAYING,
+                      NOT_IN_MATCH, NOT_YOUR_TURN, READ_SIZE, ROW_NOT_ALLOWED, FrameParser, ProtocolError, encode, relative_winners)
+from records import RecordWriter, record_game
+
+
+# CONSTANTS
+HOST = '127.0.0.1'
+PORT = 7777
+TURN_TIMEOUT = 60.0 # Seconds a side has to place its card before the match is called off
+WRITE_HIGH_WATER = 4096 # Buffered bytes beyond which a client's requests wait for its writes to drain
+MAX_BUFFERED = 65536 # Buffered bytes beyond which a client that is not reading is dropped
+BACKLOG = 4096
+
+
+# CLASSES
+class Connection:
+    """ One client socket and the match it is in. Messages go straight into the transport's buffer, a client that
+        lets more than MAX_BUFFERED bytes pile up unread is cut off rather than its buffer being allowed to grow """
+    __slots__ = ('writer', 'match', 'side')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.side = None
+
+    def send(self, kind, *values):
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BUFFERED:
+            transport.abort()
+            return
+        self.writer.write(encode(kind, *values))
+
+
+class Match:
+    """ A game between two connections, the first plays the engine's player side and moves first. The server's Game
+        is the only full copy of the game, it draws for the side to move and its place_card and result() checks
+        (validate_row and check_game_end) decide every placement and the winner """
+    __slots__ = ('server', 'connections', 'game', 'timer')
+
+    def __init__(self, server, connections, rng):
+        self.server = server
+        self.connections = connections
+        self.game = Game(rng)
+        self.timer = None
+        for side, connection in enumerate(connections):
+            connection.match = self
+            connection.side = side
+
+    def side_to_move(self):
+        return 0 if self.game.player_turn else 1
+
+    def start(self):
+        game = self.game
+        game.shuffle_deck()
+        hands = [game.player_hand, game.opponent_hand]
+        for side, connection in enumerate(self.connections):
+            connection.send(START, YOU if side == 0 else THEM, *(row[0] for row in hands[side]), *(row[0] for row in hands[1 - side]))
+        self.next_turn()
+
+    def next_turn(self):
+        game = self.game
+        game.draw_card()
+        mover = self.side_to_move()
+        for side, connection in enumerate(self.connections):
+            connection.send(DRAWN, YOU if side == mover else THEM, game.drawn_card if side == mover else HIDDEN)
+        if self.timer:
+            self.timer.cancel()
+        self.timer = asyncio.get_running_loop().call_later(self.server.turn_timeout, self.time_out)
+
+    def place(self, connection, row_index):
+        game = self.game
+        if connection.side != self.side_to_move():
+            connection.send(REJECTED, NOT_YOUR_TURN)
+            return
+        code = game.drawn_card
+        if not game.place_card(row_index):
+            connection.send(REJECTED, ROW_NOT_ALLOWED)
+            return
+        for side, other in enumerate(self.connections):
+            other.send(PLACED, YOU if side == connection.side else THEM, row_index, code)
+
+        result = game.result()
+        if result is None:
+            self.next_turn()
+            return
+        for side, other in enumerate(self.connections):
+            other.send(END, *relative_winners(result[1], side))
+        self.server.finish(self, finished=True)
+
+    def time_out(self):
+        self.timer = None
+        self.abandon()
+
+    def abandon(self):
+        """ Ends the match early, both sides are told """
+        for connection in self.connections:
+            connection.send(LEFT)
+        self.server.finish(self, finished=False)
+
+
+class MatchServer:
+    """ Hosts any number of concurrent matches on one event loop. Clients are paired in the order they send JOIN,
+        every client has one task reading its socket and matches run entirely inside those reads, with no task of
+        their own. Per-move handling time is kept, and when tracemalloc is running the memory in use at the most
+        concurrent matches, so both can be reported per match and per move """
+    def __init__(self, turn_timeout=TURN_TIMEOUT, seed=None, archive=None):
+        self.turn_timeout = turn_timeout
+        self.rng = random.Random(seed)
+        self.archive = archive
+        self.waiting = None
+        self.matches = set()
+        self.clients = 0
+        self.games = 0
+        self.abandoned = 0
+        self.moves = 0
+        self.move_times = deque(maxlen=100000)
+        self.peak_matches = 0
+        self.peak_memory = None
+        self.base_memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+    async def handle(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        client_socket = writer.get_extra_info('socket')
+        if client_socket is not None:
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = Connection(writer)
+        parser = FrameParser()
+        self.clients += 1
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                for kind, payload in parser.feed(data):
+                    self.dispatch(connection, kind, payload)
+                # Backpressure, nothing more is read from a client until what it has been sent has drained
+                await writer.drain()
+        except (ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.clients -= 1
+            self.disconnect(connection)
+            writer.close()
+
+    def dispatch(self, connection, kind, payload):
+        if kind == JOIN:
+            self.join(connection)
+        elif kind == PLACE:
+            if connection.match is None:
+                connection.send(REJECTED, NOT_IN_MATCH)
+                return
+            start = time.perf_counter()
+            connection.match.place(connection, payload[0])
+            self.move_times.append(time.perf_counter() - start)
+            self.moves += 1
+        else:
+            raise ProtocolError(f'clients cannot send message type {kind}')
+
+    def join(self, connection):
+        if connection.match is not None or self.waiting is connection:
+            connection.send(REJECTED, ALREADY_PLAYING)
+            return
+        if self.waiting is None:
+            self.waiting = connection
+            return
+        match = Match(self, [self.waiting, connection], self.rng)
+        self.waiting = None
+        self.matches.add(match)
+        if len(self.matches) > self.peak_matches:
+            self.peak_matches = len(self.matches)
+            if self.base_memory is not None:
+                self.peak_memory = tracemalloc.get_traced_memory()[0] - self.base_memory
+        match.start()
+
+    def disconnect(self, connection):
+        if self.waiting is connection:
+            self.waiting = None
+        if connection.match is not None:
+            connection.match.abandon()
+
+    def finish(self, match, finished):
+        if match.timer:
+            match.timer.cancel()
+        for connection in match.connections:
+            connection.match = None
+        self.matches.discard(match)
+        if finished:
+            self.games += 1
+            if self.archive:
+                self.archive.write(record_game(match.game))
+        else:
+            self.abandoned += 1
+
+    def report(self):
+        lines = [f'{self.clients} clients, {len(self.matches)} matches in play (peak {self.peak_matches}), {self.games} games finished, {self.abandoned} abandoned, {self.moves} moves']
+        if len(self.move_times) >= 2:
+            lines.append('move handling ' + latency_summary(self.move_times))
+        if self.peak_memory is not None and self.peak_matches:
+            lines.append(f'memory at peak {self.peak_memory / 1024:.0f} KiB, {self.peak_memory / self.peak_matches:.0f} bytes per match including both connections')
+        return '\n'.join(lines)
+
+
+# FUNCTIONS
+def latency_summary(seconds):
+    """ p50/p95/p99 of a list of durations as text in microseconds """
+    cuts = statistics.quantiles(seconds, n=100)
+    return f'p50 {cuts[49] * 1e6:.0f} p95 {cuts[94] * 1e6:.0f} p99 {cuts[98] * 1e6:.0f} us'
+
+
+async def serve(server, host=HOST, port=PORT, stats_interval=None, stop_event=None, ready_event=None):
+    """ Accepts clients until stop_event (a threading or multiprocessing Event) is set, printing a report every stats_interval seconds """
+    listener = await asyncio.start_server(server.handle, host, port, backlog=BACKLOG)
+    if ready_event:
+        ready_event.set()
+    async with listener:
+        last_report = time.perf_counter()
+        while not (stop_event and stop_event.is_set()):
+            await asyncio.sleep(0.2)
+            if stats_interval and time.perf_counter() - last_report >= stats_interval:
+                print(server.report(), flush=True)
+                last_report = time.perf_counter()
+
+
+def run_server(host=HOST, port=PORT, stats_interval=None, trace_memory=False, seed=None, record_path=None, stop_event=None, ready_event=None):
+    """ Runs a MatchServer until stopped or interrupted and prints its report, also the entry point for a server process """
+    if trace_memory:
+        tracemalloc.start()
+    archive = RecordWriter(record_path) if record_path else None
+    server = MatchServer(seed=seed, archive=archive)
+    try:
+        asyncio.run(serve(server, host, port, stats_interval, stop_event, ready_event))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.report(), flush=True)
+        if archive:
+            archive.close()
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Hosts two player matches over TCP, python main.py --connect HOST:PORT joins one')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--stats', type=float, default=None, metavar='SECONDS', help='print a report this often')
+    parser.add_argument('--trace-memory', action='store_true', help='measure memory per match with tracemalloc, which slows the server down')
+    parser.add_argument('--record', metavar='PATH', help='append every finished game to a records.py archive')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    print(f'Serving on {args.host}:{args.port}', flush=True)
+    run_server(args.host, args.port, args.stats, args.trace_memory, args.seed, args.record)
+
+
+if __name__ == "__main__":
+    main()
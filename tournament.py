@@ -0,0 +1,112 @@
+# AUTHOR - MATTHEW RAYNER | SELF-PLAY TOURNAMENT RUNNER
+
+
+# LIBRARIES
+import argparse
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from engine import ROWS, RESULT_WINNERS, play_game
+from policies import POLICIES
+
+
+# CONSTANTS
+SIDES = ['player', 'opponent', 'draw']
+Z_95 = 1.959964
+
+
+# FUNCTIONS
+def game_rng(seed, index):
+    """ Every game gets its own RNG so results never depend on how the games are split across workers """
+    return random.Random(f'{seed}:{index}')
+
+
+def empty_totals():
+    return {'games': 0, 'player': 0, 'opponent': 0, 'draw': 0, 'rows': [{side: 0 for side in SIDES} for _ in range(ROWS)]}
+
+
+def merge_totals(totals, other):
+    for key in ['games'] + SIDES:
+        totals[key] += other[key]
+    for row, other_row in zip(totals['rows'], other['rows']):
+        for side in SIDES:
+            row[side] += other_row[side]
+    return totals
+
+
+def play_chunk(task):
+    """ Plays games [start, stop) of a tournament and returns their totals, run inside the worker processes """
+    player_name, opponent_name, seed, start, stop = task
+    player_policy, opponent_policy = POLICIES[player_name], POLICIES[opponent_name]
+    totals = empty_totals()
+
+    for index in range(start, stop):
+        message, row_wins = play_game(player_policy, opponent_policy, game_rng(seed, index))
+        totals['games'] += 1
+        totals[RESULT_WINNERS[message]] += 1
+        for row_index, winner in row_wins.items():
+            totals['rows'][row_index][winner] += 1
+
+    return totals
+
+
+def run_tournament(games, player='random', opponent='random', seed=0, workers=None, chunk_size=None):
+    """ Plays a number of games across a process pool and returns the combined totals """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(2000, games // (workers * 8) or 1))
+    tasks = [(player, opponent, seed, start, min(start + chunk_size, games)) for start in range(0, games, chunk_size)]
+    totals = empty_totals()
+
+    if workers == 1:
+        for task in tasks:
+            merge_totals(totals, play_chunk(task))
+        return totals
+
+    with Pool(workers) as pool:
+        for chunk_totals in pool.imap_unordered(play_chunk, tasks):
+            merge_totals(totals, chunk_totals)
+    return totals
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    """ Returns the Wilson score interval for a proportion """
+    if not trials:
+        return 0.0, 0.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def print_report(totals, player, opponent, elapsed):
+    games = totals['games']
+    print(f'{player} (player) vs {opponent} (opponent): {games} games in {elapsed:.2f}s ({games / max(elapsed, 1e-9):.0f} games/s)')
+    for side in SIDES:
+        low, high = wilson_interval(totals[side], games)
+        print(f'  {side:<9} {totals[side]:>9}  {totals[side] / max(games, 1):7.2%}  95% CI [{low:.2%}, {high:.2%}]')
+    print('  row  player  opponent  draw')
+    for row_index, row in enumerate(totals['rows']):
+        print(f'  {row_index + 1:>3}  {row["player"]:>6}  {row["opponent"]:>8}  {row["draw"]:>4}')
+
+
+# MAIN
+def main():
+    parser = argparse.ArgumentParser(description='Plays complete games between two placement policies')
+    parser.add_argument('-n', '--games', type=int, default=10000)
+    parser.add_argument('--player', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--opponent', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='defaults to one per CPU')
+    parser.add_argument('--chunk-size', type=int, default=None, help='games per worker task')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = run_tournament(args.games, args.player, args.opponent, args.seed, args.workers, args.chunk_size)
+    print_report(totals, args.player, args.opponent, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
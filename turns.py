@@ -0,0 +1,101 @@
+# AUTHOR - MATTHEW RAYNER | OPPONENT TURN SCHEDULER
+
+
+# LIBRARIES
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from policies import DIFFICULTIES, random_policy
+
+
+# CONSTANTS
+_CURRENT_MOVE = []
+
+
+# CLASSES
+class TurnScheduler:
+    """ Works out opponent moves off the main thread. A move is started on a snapshot of the game and polled for
+        every frame, the result comes back with the (version, drawn_card) it was decided for so the caller only
+        applies it if the game is still in that position. 'thread' mode shares the policy's caches with the
+        window, 'process' mode runs the policy in its own process so it never competes with drawing for the GIL.
+        Every move is numbered and the number of the move wanted is shared with the worker, so a search for a
+        move that has been cancelled or replaced stops early instead of holding up the next one """
+    def __init__(self, difficulty, mode='thread'):
+        self.difficulty = difficulty
+        self.mode = mode
+        self.context = multiprocessing.get_context('spawn')
+        self.current_move = self.context.RawValue('q', 0)
+        self.executor = self.make_executor()
+        self.pending = None
+
+    def make_executor(self):
+        if self.mode == 'process':
+            return ProcessPoolExecutor(1, mp_context=self.context, initializer=share_current_move, initargs=(self.current_move,))
+        return ThreadPoolExecutor(1, thread_name_prefix='opponent', initializer=share_current_move, initargs=(self.current_move,))
+
+    @property
+    def thinking(self):
+        return self.pending is not None
+
+    def start(self, game, seed):
+        """ Starts deciding the move for game.drawn_card, seed gives the policy its own RNG """
+        key = (game.version, game.drawn_card)
+        self.current_move.value += 1
+        task = (choose_row, self.difficulty, game.snapshot(), seed, self.current_move.value)
+        try:
+            future = self.executor.submit(*task)
+        except BrokenProcessPool:
+            self.executor = self.make_executor()
+            future = self.executor.submit(*task)
+        self.pending = (future, key)
+
+    def poll(self, game):
+        """ Returns (key, row_index) once the pending move is ready, None while it is still thinking. If the policy
+            failed, or the worker process died, the card is placed at random in the live game instead """
+        if self.pending is None or not self.pending[0].done():
+            return None
+        future, key = self.pending
+        self.pending = None
+        try:
+            return key, future.result()
+        except Exception as error:
+            print(f'Opponent move failed, placing at random: {error!r}')
+            if isinstance(error, BrokenProcessPool):
+                self.executor = self.make_executor()
+            row_index = random_policy(game, game.rng) if key == (game.version, game.drawn_card) else None
+            return key, row_index
+
+    def cancel(self):
+        """ Drops the pending move, a policy already running stops at its next check """
+        self.current_move.value += 1
+        if self.pending is not None:
+            self.pending[0].cancel()
+            self.pending = None
+
+    def close(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class MoveStop:
+    """ The policy's stop, set once the scheduler has moved on from this move """
+    __slots__ = ('current_move', 'move')
+
+    def __init__(self, current_move, move):
+        self.current_move = current_move
+        self.move = move
+
+    def is_set(self):
+        return self.current_move.value != self.move
+
+
+# FUNCTIONS
+def share_current_move(current_move):
+    """ Worker initializer, keeps the scheduler's shared move number """
+    _CURRENT_MOVE[:] = [current_move]
+
+
+def choose_row(difficulty, game, seed, move):
+    """ Runs on the worker, DIFFICULTIES is looked up there so each worker keeps its own policy caches """
+    return DIFFICULTIES[difficulty](game, random.Random(seed), MoveStop(_CURRENT_MOVE[0], move))